@@ -0,0 +1,8 @@
+from typing import Optional
+from pydantic import BaseModel
+
+class LocationOccupancy(BaseModel):
+    code: str
+    description: Optional[str]
+    wines: int
+    bottles: int
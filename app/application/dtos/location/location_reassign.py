@@ -0,0 +1,11 @@
+from typing import List, Optional
+from pydantic import BaseModel, Field
+
+class LocationReassign(BaseModel):
+    target_code: str
+    wine_ids: Optional[List[int]] = Field(None, description="Defaults to every wine at the location")
+
+class LocationReassignResult(BaseModel):
+    source_code: str
+    target_code: str
+    moved: int
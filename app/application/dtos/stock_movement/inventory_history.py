@@ -0,0 +1,36 @@
+from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+class InventoryHistoryPoint(BaseModel):
+    movement_id: int
+    timestamp: datetime
+    delta: int = Field(..., example=-2)
+    balance: int = Field(..., example=28)
+    location_code: Optional[str] = Field(None, example="A12")
+    comment: Optional[str] = None
+
+
+class InventoryHistory(BaseModel):
+    wine_id: int
+    start: Optional[datetime] = None
+    end: datetime
+    checkpoint_at: Optional[datetime] = Field(None, description="Checkpoint run the balances start from")
+    opening_balance: int = Field(..., description="Bottles before the first point")
+    closing_balance: int = Field(..., description="Bottles after the last point")
+    truncated: bool = Field(False, description="More movements until end; continue with start=<last timestamp>")
+    points: List[InventoryHistoryPoint]
+
+
+class WineBalance(BaseModel):
+    wine_id: int
+    name: str
+    stock: int
+
+
+class InventoryAsOf(BaseModel):
+    as_of: datetime
+    checkpoint_at: Optional[datetime] = None
+    wines: int
+    bottles: int
+    items: List[WineBalance]
@@ -0,0 +1,21 @@
+from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+class MovementBucket(BaseModel):
+    start: datetime
+    inflow: int = Field(..., example=24)
+    outflow: int = Field(..., example=6)
+    net: int = Field(..., example=18)
+    movements: int = Field(..., example=5)
+
+
+class MovementSeries(BaseModel):
+    bucket: str = Field(..., example="day")
+    step: int = Field(..., description="Units per point; above 1 when the range was downsampled to max_points")
+    start: datetime
+    end: datetime
+    wine_id: Optional[int] = None
+    location_code: Optional[str] = None
+    user_id: Optional[int] = None
+    points: List[MovementBucket]
@@ -0,0 +1,19 @@
+from typing import Optional
+from pydantic import BaseModel, Field, field_validator
+
+class StockAdjust(BaseModel):
+    delta: int = Field(..., example=-2, description="Signed change applied to the current stock")
+    comment: Optional[str] = Field(None, example="Sold 2 bottles")
+
+    @field_validator("delta")
+    def validate_delta(cls, v):
+        if v == 0:
+            raise ValueError("Delta can't be zero")
+        return v
+
+
+class StockAdjustResult(BaseModel):
+    wine_id: int = Field(..., example=1)
+    delta: int = Field(..., example=-2)
+    stock: int = Field(..., example=23)
+    movement_id: int = Field(..., example=57)
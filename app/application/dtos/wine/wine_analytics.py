@@ -0,0 +1,24 @@
+from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+class InventoryBreakdown(BaseModel):
+    key: str = Field(..., example="Malbec")
+    label: Optional[str] = Field(None, example="Cava principal")
+    wines: int = Field(..., example=12)
+    bottles: int = Field(..., example=180)
+    value_usd: float = Field(..., example=2790.0)
+    low_stock: int = Field(..., example=2)
+    off_stock: int = Field(..., example=1)
+
+
+class InventoryAnalytics(BaseModel):
+    wines: int = Field(..., example=40)
+    bottles: int = Field(..., example=620)
+    value_usd: float = Field(..., example=9610.0)
+    low_stock: int = Field(..., example=5)
+    off_stock: int = Field(..., example=2)
+    by_location: List[InventoryBreakdown]
+    by_grape: List[InventoryBreakdown]
+    by_vintage: List[InventoryBreakdown]
+    generated_at: datetime
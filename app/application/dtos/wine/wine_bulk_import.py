@@ -0,0 +1,16 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+class WineImportRowResult(BaseModel):
+    row: int = Field(..., example=0)
+    status: str = Field(..., example="created")
+    wine_id: Optional[int] = Field(None, example=42)
+    errors: List[str] = Field(default_factory=list)
+
+
+class WineImportReport(BaseModel):
+    received: int
+    created: int
+    failed: int
+    locations_created: int
+    rows: List[WineImportRowResult]
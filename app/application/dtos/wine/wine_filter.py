@@ -0,0 +1,21 @@
+from typing import Literal, Optional
+from pydantic import BaseModel, Field, model_validator
+
+class WineFilter(BaseModel):
+    grape: Optional[str] = Field(None, example="Malbec")
+    year_min: Optional[int] = Field(None, example=2015)
+    year_max: Optional[int] = Field(None, example=2020)
+    price_min: Optional[float] = Field(None, ge=0, example=10)
+    price_max: Optional[float] = Field(None, ge=0, example=40)
+    location_code: Optional[str] = Field(None, example="A12")
+    stock_status: Optional[Literal["off", "low", "good"]] = Field(None, example="low")
+    sort_by: Literal["id", "price", "year", "stock"] = Field("id", example="price")
+    order: Literal["asc", "desc"] = Field("asc", example="desc")
+
+    @model_validator(mode="after")
+    def validate_ranges(self):
+        if self.year_min is not None and self.year_max is not None and self.year_min > self.year_max:
+            raise ValueError("year_min must be lower than or equal to year_max")
+        if self.price_min is not None and self.price_max is not None and self.price_min > self.price_max:
+            raise ValueError("price_min must be lower than or equal to price_max")
+        return self
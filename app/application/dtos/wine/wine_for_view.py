@@ -12,3 +12,5 @@ class WineRead(BaseModel):
     location_name: str = Field(..., example="A12")
     owner: str = Field(..., example="juanperez")
     stock_status: str = Field(..., example="Disponible")
+    # row version, sent as the ETag header instead of in the body
+    version: Optional[int] = Field(None, exclude=True)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 
 from app.application.dtos.wine.wine_for_view import WineRead
 
@@ -8,3 +8,11 @@ class PaginatedWines(BaseModel):
     offset: int
     limit: int
     items: List[WineRead]
+
+
+class CursorPaginatedWines(BaseModel):
+    limit: int
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+    total: Optional[int] = None
+    items: List[WineRead]
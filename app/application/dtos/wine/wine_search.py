@@ -0,0 +1,11 @@
+from pydantic import BaseModel, Field
+from typing import List
+
+from app.application.dtos.wine.wine_for_view import WineRead
+
+class WineSearchResults(BaseModel):
+    query: str = Field(..., example="malbek")
+    total: int = Field(..., description="Matches for the query; 0 when offset is past the last match")
+    offset: int
+    limit: int
+    items: List[WineRead]
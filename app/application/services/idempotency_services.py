@@ -0,0 +1,75 @@
+import asyncio
+import hashlib
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+from fastapi import HTTPException, Response
+from pydantic import BaseModel
+from app.persistence.configuration.unit_of_work import UnitOfWork
+from app.persistence.repository.idempotency_repository import IdempotencyRepository
+from helpers.idempotency import StoredResponse, idempotency_cache
+
+
+def _fingerprint(scope: str, payload: BaseModel) -> str:
+    return hashlib.sha256(f"{scope}\n{payload.model_dump_json()}".encode()).hexdigest()
+
+
+class IdempotencyService:
+    def __init__(self, uow: UnitOfWork):
+        self.uow = uow
+        self.repo = IdempotencyRepository(uow.session)
+
+    @staticmethod
+    def _replay(stored: StoredResponse, fingerprint: str) -> Response:
+        if stored.fingerprint != fingerprint:
+            idempotency_cache.conflicts += 1
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+        idempotency_cache.replays += 1
+        return Response(content=stored.body, status_code=stored.status_code, media_type="application/json",
+                        headers={"Idempotent-Replayed": "true"})
+
+    async def run(self, idempotency_key: str, scope: str, payload: BaseModel,
+                  operation: Callable[[], Awaitable[BaseModel]], status_code: int = 200) -> Response:
+        """Runs operation once per (scope, Idempotency-Key) and returns its response; a retry replays it.
+
+        scope is the route and the caller ("PUT /wines/3/stock user 1"); payload is the request body,
+        whose hash must match on replays. The key is stored in the request's transaction, so a
+        request that fails leaves nothing behind and can be retried with the same key.
+        """
+        key = f"{scope}:{idempotency_key}"
+        fingerprint = _fingerprint(scope, payload)
+        while True:
+            stored = idempotency_cache.get(key)
+            if stored is not None:
+                return self._replay(stored, fingerprint)
+            pending = idempotency_cache.in_flight(key)
+            if pending is None:
+                break
+            # same key already running in this process: wait for it to commit (replay) or roll back (run again)
+            idempotency_cache.waits += 1
+            try:
+                await asyncio.wait_for(asyncio.shield(pending), idempotency_cache.wait)
+            except asyncio.TimeoutError:
+                raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+
+        claimed = idempotency_cache.begin(key)
+        self.uow.after_rollback(lambda: idempotency_cache.release(key, claimed))
+        now = datetime.now()
+        row = await self.repo.read(key, now)
+        if row is None and await self.repo.claim(key, fingerprint, now, now + timedelta(seconds=idempotency_cache.ttl)):
+            result = await operation()
+            body = result.model_dump_json()
+            await self.repo.complete(key, status_code, body)
+
+            def committed():
+                idempotency_cache.store(key, fingerprint, status_code, body)
+                idempotency_cache.release(key, claimed)
+            self.uow.after_commit(committed)
+            return Response(content=body, status_code=status_code, media_type="application/json")
+
+        # committed by another worker, before our read or between the read and the claim
+        if row is None:
+            row = await self.repo.read(key, now)
+        remaining = (row.expires_at - now).total_seconds()
+        stored = idempotency_cache.store(key, row.fingerprint, row.status_code, row.body, ttl=remaining)
+        self.uow.after_commit(lambda: idempotency_cache.release(key, claimed))
+        return self._replay(stored, fingerprint)
@@ -1,42 +1,93 @@
 from typing import List, Optional
-from sqlalchemy.ext.asyncio import AsyncSession
+from app.persistence.configuration.unit_of_work import UnitOfWork
 from fastapi import HTTPException
 from app.domain.entities.location import Location
 from app.application.dtos.location.location_for_read import LocationForRead
 from app.application.dtos.location.location_for_create import LocationForCreate
+from app.application.dtos.location.location_for_update import LocationForUpdate
+from app.application.dtos.location.location_occupancy import LocationOccupancy
+from app.application.dtos.user.user_credentials import UserSession
 from app.persistence.repository.location_repository import LocationRepository
 from app.application.dtos.wine.wine_for_view import WineRead
+from helpers.analytics_cache import inventory_analytics_cache
+from helpers.catalog_cache import public_catalog_cache
+from helpers.location_registry import location_registry
 
 class LocationServices:
-    def __init__(self, session: AsyncSession):
-        self.repo = LocationRepository(session)
+    def __init__(self, uow: UnitOfWork):
+        self.uow = uow
+        self.repo = LocationRepository(uow.session)
+
+    async def _load_registry(self) -> None:
+        # the whole table is one small SELECT; reloaded when the TTL has run out
+        if not location_registry.loaded:
+            location_registry.load((location.code, location.description) for location in await self.repo.read())
 
     async def create(self, location_create: LocationForCreate) -> LocationForRead:
         location = Location(**location_create.model_dump())
         location = await self.repo.create(location)
+        self.uow.after_commit(lambda: location_registry.put(location.code, location.description))
         return LocationForRead(
             code=location.code,
             description=location.description,
             wines=[]
         )
 
+    async def create_location(self, location_create: LocationForCreate, current_user: UserSession) -> LocationForRead:
+        if current_user.role != "admin":
+            raise HTTPException(status_code=403, detail="Only admin users can create locations")
+        if await self.repo.read_by_code(location_create.code):
+            raise HTTPException(status_code=409, detail="Location already exists")
+        return await self.create(location_create)
+
+    async def occupancy(self, current_user: UserSession, code: Optional[str] = None) -> List[LocationOccupancy]:
+        if current_user.role != "admin":
+            raise HTTPException(status_code=403, detail="Not authorized")
+        rows = await self.repo.occupancy(code)
+        if code is not None and not rows:
+            raise HTTPException(status_code=404, detail="Location not found")
+        return [LocationOccupancy(code=code, description=description, wines=wines, bottles=bottles)
+                for code, description, wines, bottles in rows]
+
     async def get_by_id(self, location_code: int) -> Optional[LocationForRead]:
-        location = await self.repo.read_by_code(location_code)
-        if not location:
-            return None
-        return LocationForRead(code=location.code,description=location.description)
+        return await self.get_by_code(location_code)
     
     async def get_by_code(self, code: str) -> Optional[LocationForRead]:
-        print("porno", code)
+        await self._load_registry()
+        description = location_registry.get(code)
+        if description is not None:
+            return LocationForRead(code=code, description=description)
+        # unknown here, but another worker may have created it since the registry was loaded
         location = await self.repo.read_by_code(code)
-        print("loccc", location)
         if not location:
             return None  
+        self.uow.after_commit(lambda: location_registry.put(location.code, location.description))
         return LocationForRead(code=location.code,description=location.description)
     
     
-    async def get_by_codes(self, codes: set[str]) -> List[Location]:
-        return await self.repo.read_by_codes(codes)
+    async def get_by_codes(self, codes: set[str]) -> List[LocationForRead]:
+        await self._load_registry()
+        found, missing = location_registry.get_many(codes)
+        if missing:
+            locations = await self.repo.read_by_codes(missing)
+            found.update((location.code, location.description) for location in locations)
+            self.uow.after_commit(lambda: location_registry.put_missing({location.code: location.description for location in locations}))
+        return [LocationForRead(code=code, description=description) for code, description in found.items()]
+
+    async def update(self, location_code: str, location_update: LocationForUpdate, current_user: UserSession) -> LocationForRead:
+        if current_user.role != "admin":
+            raise HTTPException(status_code=403, detail="Only admin users can update locations")
+        if not await self.repo.read_by_code(location_code):
+            raise HTTPException(status_code=404, detail="Location not found")
+        location = await self.repo.update(location_code, Location(**location_update.model_dump(exclude_unset=True)))
+
+        def changed():
+            # the description is part of every WineRead and of the analytics location labels
+            location_registry.put(location.code, location.description)
+            public_catalog_cache.bump()
+            inventory_analytics_cache.clear()
+        self.uow.after_commit(changed)
+        return LocationForRead(code=location.code, description=location.description)
 
 
     async def list(self) -> List[LocationForRead]:
@@ -49,13 +100,16 @@ class LocationServices:
             ))
         return result
 
-    async def delete(self, location__code: str) -> bool:
+    async def delete(self, location__code: str, current_user: UserSession) -> bool:
+        if current_user.role != "admin":
+            raise HTTPException(status_code=403, detail="Only admin users can delete locations")
         location = await self.repo.read_by_code(location__code)
         if not location:
             raise HTTPException(status_code=404, detail="Location not found")
-        # No permitir eliminar si tiene vinos asociados
-        if hasattr(location, "wines") and location.wines and len(location.wines) > 0:
+        # No permitir eliminar si tiene vinos asociados (EXISTS, sin cargar location.wines)
+        if await self.repo.has_wines(location__code):
             raise HTTPException(status_code=400, detail="No se puede eliminar una location con vinos asociados.")
         await self.repo.delete(location__code)
+        self.uow.after_commit(lambda: location_registry.invalidate(location__code))
         return True
     
@@ -1,14 +1,48 @@
+import asyncio
+import math
+from datetime import datetime, timedelta
 from typing import List, Optional
-from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException
 from app.domain.entities.stock_movement import StockMovement
 from app.application.dtos.stock_movement.stock_for_read import StockMovementRead
 from app.application.dtos.stock_movement.stock_for_create import StockCreate
+from app.application.dtos.stock_movement.inventory_history import (
+    InventoryAsOf, InventoryHistory, InventoryHistoryPoint, WineBalance,
+)
+from app.application.dtos.stock_movement.movement_series import MovementBucket, MovementSeries
+from app.application.dtos.user.user_credentials import UserSession
+from app.persistence.configuration.unit_of_work import UnitOfWork
 from app.persistence.repository.stock_movement_repository import StockMovementRepository
+from app.persistence.repository.stock_checkpoint_repository import StockCheckpointRepository
+from app.persistence.repository.wine_repository import WineRepository
+from helpers.movement_writer import movement_writer
+
+# bucket width in seconds; months are calendar months (None)
+BUCKET_SECONDS = {"hour": 3600, "day": 86400, "week": 7 * 86400, "month": None}
+
+
+def _bucket_floor(moment: datetime, bucket: str) -> datetime:
+    if bucket == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _add_months(moment: datetime, months: int) -> datetime:
+    index = moment.year * 12 + moment.month - 1 + months
+    return moment.replace(year=index // 12, month=index % 12 + 1)
+
 
 class StockMovementService:
-    def __init__(self, session: AsyncSession):
-        self.repo = StockMovementRepository(session)
+    def __init__(self, uow: UnitOfWork):
+        self.repo = StockMovementRepository(uow.session)
+        self.checkpoint_repo = StockCheckpointRepository(uow.session)
+        self.wine_repo = WineRepository(uow.session)
+        self.uow = uow
 
     async def create(self, movement_create: StockCreate) -> StockMovementRead:
         movement = StockMovement(**movement_create.model_dump())
@@ -17,6 +51,15 @@ class StockMovementService:
             raise HTTPException(status_code=400, detail="Error creating stock movement")
         return StockMovementRead.model_validate(movement, from_attributes=True)
 
+    async def record(self, movement_create: StockCreate) -> None:
+        """Logs a movement: queued for the batched writer once the request commits when it runs,
+        written in the request's transaction otherwise."""
+        if movement_writer.enabled:
+            row = dict(movement_create.model_dump(), timestamp=datetime.now(), comment=None)
+            self.uow.after_commit(lambda: movement_writer.submit(row))
+            return
+        await self.create(movement_create)
+
     async def get_by_id(self, movement_id: int) -> Optional[StockMovementRead]:
         movement = await self.repo.read_by_id(movement_id)
         if not movement:
@@ -32,4 +75,102 @@ class StockMovementService:
         if not movement:
             raise HTTPException(status_code=404, detail="Stock movement not found")
         await self.repo.delete(movement_id)
-        return True
\ No newline at end of file
+        return True
+
+    async def wine_history(self, wine_id: int, current_user: UserSession, start: Optional[datetime] = None,
+                           end: Optional[datetime] = None, limit: int = 500) -> InventoryHistory:
+        if current_user.role != "admin":
+            raise HTTPException(status_code=403, detail="Not authorized")
+        end = end or datetime.now()
+        if start is not None and start > end:
+            raise HTTPException(status_code=400, detail="start must be before end")
+        if not await self.wine_repo.read_by_id_soft_delete(wine_id):
+            raise HTTPException(status_code=404, detail="Wine not found")
+
+        # the newest checkpoint before start bounds the scan to one checkpoint interval plus the requested range
+        checkpoint = await self.checkpoint_repo.wine_balance(wine_id, start) if start is not None else None
+        since, base = checkpoint if checkpoint else (None, 0)
+        rows = await self.repo.history(wine_id, since=since, start=start, end=end, limit=limit + 1)
+        truncated = len(rows) > limit
+        rows = rows[:limit]
+
+        points = [
+            InventoryHistoryPoint(movement_id=row.id, timestamp=row.timestamp, delta=row.delta, balance=base + row.running,
+                                  location_code=row.location_code, comment=row.comment)
+            for row in rows
+        ]
+        if points:
+            opening = points[0].balance - points[0].delta
+            closing = points[-1].balance
+        else:
+            opening = closing = base + await self.repo.sum_deltas(wine_id, since=since, until=end)
+        return InventoryHistory(wine_id=wine_id, start=start, end=end, checkpoint_at=since, opening_balance=opening,
+                                closing_balance=closing, truncated=truncated, points=points)
+
+    async def inventory_as_of(self, current_user: UserSession, at: Optional[datetime] = None) -> InventoryAsOf:
+        if current_user.role != "admin":
+            raise HTTPException(status_code=403, detail="Not authorized")
+        at = at or datetime.now()
+        run = await self.checkpoint_repo.latest_run(at)
+        items = [WineBalance(wine_id=wine_id, name=name, stock=stock)
+                 for wine_id, name, stock in await self.repo.balances_as_of(run, at)]
+        return InventoryAsOf(as_of=at, checkpoint_at=run, wines=len(items), bottles=sum(item.stock for item in items), items=items)
+
+    async def movement_series(self, current_user: UserSession, bucket: str = "day", start: Optional[datetime] = None,
+                              end: Optional[datetime] = None, max_points: int = 200, wine_id: Optional[int] = None,
+                              location_code: Optional[str] = None, user_id: Optional[int] = None) -> MovementSeries:
+        if current_user.role != "admin":
+            raise HTTPException(status_code=403, detail="Not authorized")
+        unit_seconds = BUCKET_SECONDS[bucket]
+        end = end or datetime.now()
+        if start is None:
+            # default range: max_points buckets at full resolution
+            start = _add_months(end, -(max_points - 1)) if unit_seconds is None else end - timedelta(seconds=unit_seconds * (max_points - 1))
+        if start > end:
+            raise HTTPException(status_code=400, detail="start must be before end")
+
+        origin = _bucket_floor(start, bucket)
+        if unit_seconds is None:
+            units = (end.year * 12 + end.month) - (origin.year * 12 + origin.month) + 1
+        else:
+            units = math.floor((end - origin).total_seconds() / unit_seconds) + 1
+        # downsampling: widen every point to `step` units so at most max_points come back
+        step = max(1, math.ceil(units / max_points))
+
+        rows = {row.bucket: row for row in await self.repo.series(
+            origin, end, unit_seconds, step, wine_id=wine_id, location_code=location_code, user_id=user_id)}
+        points = []
+        for index in range(math.ceil(units / step)):
+            row = rows.get(index)
+            bucket_start = (_add_months(origin, index * step) if unit_seconds is None
+                            else origin + timedelta(seconds=unit_seconds * step * index))
+            points.append(MovementBucket(
+                start=bucket_start,
+                inflow=row.inflow if row else 0,
+                outflow=row.outflow if row else 0,
+                net=row.net if row else 0,
+                movements=row.movements if row else 0,
+            ))
+        return MovementSeries(bucket=bucket, step=step, start=origin, end=end, wine_id=wine_id,
+                              location_code=location_code, user_id=user_id, points=points)
+
+    async def take_checkpoint(self, taken_at: datetime) -> int:
+        rows = await self.checkpoint_repo.create_run(taken_at)
+        await self.uow.commit()
+        return rows
+
+    async def compact(self, cutoff: datetime, batch_size: int = 1000, pause: float = 0.0) -> dict:
+        """Archives the movements before cutoff. The checkpoint at cutoff is taken first, so balances
+        stay exact throughout; every batch is its own short transaction, so API writes interleave."""
+        await self.take_checkpoint(cutoff)
+        archived = 0
+        while True:
+            moved = await self.repo.archive_before(cutoff, batch_size)
+            await self.uow.commit()
+            archived += moved
+            if moved < batch_size:
+                break
+            await asyncio.sleep(pause)
+        pruned = await self.checkpoint_repo.prune_runs(cutoff)
+        await self.uow.commit()
+        return {"cutoff": cutoff.isoformat(), "archived": archived, "checkpoint_rows_pruned": pruned}
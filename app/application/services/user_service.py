@@ -3,8 +3,6 @@ from fastapi import HTTPException
 import jwt
 from dotenv import load_dotenv
 import os
-from passlib.context import CryptContext
-from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import IntegrityError
 
 
@@ -13,14 +11,18 @@ from app.application.dtos.user.user_for_view import UserRead
 from app.application.dtos.user.user_for_create import UserForCreate
 from app.application.dtos.user.user_for_update import UserForUpdate
 from app.application.dtos.user.user_credentials import Token, UserSession
+from app.persistence.configuration.unit_of_work import UnitOfWork
 from app.persistence.repository.user_repository import UserRepository
 from app.domain.entities.user import User
+from helpers.password_hasher import password_hasher
+from helpers.user_cache import active_user_cache
 
 
 class UserService:
-    def __init__(self, session: AsyncSession):
-        self.repo = UserRepository(session)
-        self.pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    def __init__(self, uow: UnitOfWork):
+        self.uow = uow
+        self.repo = UserRepository(uow.session)
+        self.pwd_context = password_hasher
         load_dotenv()
 
     async def list_users(self, current_user: UserSession) -> list[UserRead]:
@@ -45,10 +47,12 @@ class UserService:
     async def create_user(self, user_create: UserForCreate ) -> UserRead:
         try:
             user_data = user_create.model_dump()
-            user_data["hashed_password"] = self.pwd_context.hash(user_data.pop("password"))
+            user_data["hashed_password"] = await self.pwd_context.hash(user_data.pop("password"))
             user = User(**user_data)
             user = await self.repo.create(user)
             return UserRead.model_validate(user.model_dump())
+        except HTTPException:
+            raise
         except IntegrityError:
             raise HTTPException(status_code=409,detail="username exist or is desactivated")
         except Exception as e:
@@ -71,11 +75,12 @@ class UserService:
 
             for key, value in user_update.model_dump().items():
                 if key == "password":
-                    setattr(user, "hashed_password", self.pwd_context.hash(value))
+                    setattr(user, "hashed_password", await self.pwd_context.hash(value))
                 else:
                     setattr(user, key, value)
                 
             updated_user = await self.repo.update(user)
+            self.uow.after_commit(lambda: active_user_cache.invalidate(user_id))
 
             return UserRead.model_validate(updated_user, from_attributes=True)
         except HTTPException:
@@ -111,6 +116,7 @@ class UserService:
                 raise HTTPException(status_code=404, detail="User not found")
 
             await self.repo.delete(user)
+            self.uow.after_commit(lambda: active_user_cache.invalidate(user_id))
 
             return {"message": f"User '{user.username}' was successfully deleted."}
 
@@ -124,7 +130,7 @@ class UserService:
         try:
             user = await self.repo.auth(username)
 
-            if not user or not self.pwd_context.verify(password, user.hashed_password):
+            if not user or not await self.pwd_context.verify(password, user.hashed_password):
                 raise HTTPException(
                     status_code=401,
                     detail="credentials invalid"
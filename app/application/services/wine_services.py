@@ -1,18 +1,34 @@
+import asyncio
+import base64
+import binascii
+import csv
+import io
+import json
 from datetime import datetime
-from sqlalchemy.exc import IntegrityError
-from typing import List, Optional
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import inspect
+from sqlalchemy.exc import IntegrityError, OperationalError
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, TypeVar
 from fastapi import HTTPException
 from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter, ValidationError
 
 from app.application.dtos.stock_movement.stock_for_read import StockMovementRead
 from app.application.dtos.stock_movement.stock_for_update import StockUpdate
+from app.application.dtos.stock_movement.stock_for_adjust import StockAdjust, StockAdjustResult
 from app.application.dtos.user.user_credentials import UserSession
 from app.application.dtos.wine.wine_for_update_stock import WineStockUpdate
-from app.application.dtos.wine.wine_paginated import PaginatedWines
-from app.domain.entities.wine import Wine
+from app.application.dtos.wine.wine_bulk_import import WineImportReport, WineImportRowResult
+from app.application.dtos.wine.wine_paginated import CursorPaginatedWines, PaginatedWines
+from app.application.dtos.wine.wine_search import WineSearchResults
+from app.application.dtos.wine.wine_filter import WineFilter
+from app.application.dtos.wine.wine_analytics import InventoryAnalytics, InventoryBreakdown
+from app.domain.entities.wine import LOW_STOCK_THRESHOLD, Wine
+from app.domain.entities.stock_movement import StockMovement
+from app.persistence.configuration.database import async_session
+from app.persistence.configuration.unit_of_work import UnitOfWork
 from app.persistence.repository.wine_repository import WineRepository
 from app.persistence.repository.stock_movement_repository import StockMovementRepository
+from app.persistence.repository.location_repository import LocationRepository
 from app.application.services.location_services import LocationServices
 from app.application.services.stock_movement import StockMovementService
 from app.application.dtos.stock_movement.stock_for_create import StockCreate
@@ -21,7 +37,14 @@ from app.application.dtos.wine.wine_for_view import WineRead
 from app.application.dtos.wine.wine_for_update import WineUpdate
 from app.application.dtos.wine.wine_for_create import WineCreate
 from app.application.dtos.location.location_for_create import LocationForCreate
+from app.application.dtos.location.location_reassign import LocationReassign, LocationReassignResult
+from helpers.analytics_cache import inventory_analytics_cache
+from helpers.catalog_cache import CatalogEntry, public_catalog_cache
+from helpers.location_registry import location_registry
+from helpers.search import build_match_query, search_vocabulary
 
+# read-and-update rounds set_stock tries before answering 409
+SET_STOCK_ATTEMPTS = 3
 
 
 class WineNotFoundError(Exception):
@@ -30,18 +53,63 @@ class WineNotFoundError(Exception):
 class WineServiceError(Exception):
     pass
 
+class StaleWineError(Exception):
+    """The wine's version no longer matches the one the change was based on."""
+    pass
+
+def wine_etag(version: int) -> str:
+    return f'"{version}"'
+
+def _if_match_versions(if_match: Optional[str]) -> Optional[set[int]]:
+    # versions an If-Match header accepts; None for no header or "*". Weak tags never match (strong comparison)
+    if not if_match or if_match.strip() == "*":
+        return None
+    versions = set()
+    for tag in if_match.split(","):
+        tag = tag.strip()
+        if tag.startswith('"') and tag.endswith('"') and tag[1:-1].isdigit():
+            versions.add(int(tag[1:-1]))
+    return versions
+
+def _encode_cursor(direction: str, wine_id: int) -> str:
+    raw = json.dumps({"d": direction, "id": wine_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _decode_cursor(cursor: str) -> tuple[str, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        direction, wine_id = data["d"], int(data["id"])
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if direction not in ("next", "prev"):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return direction, wine_id
+
+_wine_list_adapter = TypeAdapter(List[WineRead])
+
 class WineServices:
-    def __init__(self, session: AsyncSession, db: AsyncSession):
-        self.repo = WineRepository(session)
-        self.location_services = LocationServices(session)
-        self.stock_movement_service = StockMovementService(session)
-        self.stock_movement_repo = StockMovementRepository(session)
-        self.db = db
+    def __init__(self, uow: UnitOfWork):
+        self.uow = uow
+        self.repo = WineRepository(uow.session)
+        self.location_services = LocationServices(uow)
+        self.stock_movement_service = StockMovementService(uow)
+        self.stock_movement_repo = StockMovementRepository(uow.session)
+        self.location_repo = LocationRepository(uow.session)
 
 
-    async def _transform_wine_to_read(self, wine: Wine,) -> WineRead:
-        location = await self.location_services.get_by_code(wine.location_code)
-        await self.db.refresh(wine, attribute_names=["location", "user"])
+    def _wines_changed(self, *owner_ids: Optional[int]) -> None:
+        # once the wine or stock change commits: new public catalog version, drop the owners' analytics
+        def invalidate():
+            public_catalog_cache.bump()
+            for owner_id in set(owner_ids):
+                if owner_id is not None:
+                    inventory_analytics_cache.invalidate(owner_id)
+        self.uow.after_commit(invalidate)
+
+    @staticmethod
+    def _to_read(wine: Wine) -> WineRead:
+        # expects wine.user and wine.location already loaded (see wine_read_options)
         return WineRead(
             name=wine.name,
             year=wine.year,
@@ -50,21 +118,32 @@ class WineServices:
             stock=wine.stock,
             is_available=wine.is_available,
             location_name=wine.location.description,
-            location_description=location.description if location else None,
+            location_description=wine.location.description if wine.location else None,
             owner = (f"{wine.user.first_name} {wine.user.last_name}"if wine.user else "Unknown"),
             stock_status=(
                 "Off stock" if wine.stock == 0 else
-                "Low Stock" if wine.stock < 5 else
+                "Low Stock" if wine.stock < LOW_STOCK_THRESHOLD else
                 "Good stock"
-            )
+            ),
+            version=wine.version,
         )
 
-    async def list_wines(self, current_user:UserSession) -> List[WineRead]:
+    async def _transform_wine_to_read(self, wine: Wine,) -> WineRead:
+        unloaded = inspect(wine).unloaded
+        if "location" in unloaded or "user" in unloaded:
+            await self.uow.session.refresh(wine, attribute_names=["location", "user"])
+        return self._to_read(wine)
+
+    @staticmethod
+    def _transform_wines_to_read(wines: List[Wine]) -> List[WineRead]:
+        return [WineServices._to_read(wine) for wine in wines]
+
+    async def list_wines(self, current_user:UserSession, filters: Optional[WineFilter] = None) -> List[WineRead]:
         try:
             if current_user.role != "admin":
                 raise HTTPException(status_code=403,detail="you are not authorized to see all wines")
-            wines = await self.repo.read(current_user.id)          
-            return [await self._transform_wine_to_read(wine) for wine in wines]
+            wines = await self.repo.read(current_user.id, filters=filters.model_dump() if filters else None)          
+            return self._transform_wines_to_read(wines)
         except Exception as e:
             raise WineServiceError(f"Error listing wine: {str(e)}")
     async def list_public_wines(self)-> List[WineRead]:
@@ -72,26 +151,132 @@ class WineServices:
             wines = await self.repo.read() 
             if not wines:
                 raise WineServiceError(f"Error listing wine")         
-            return [await self._transform_wine_to_read(wine) for wine in wines]
+            return self._transform_wines_to_read(wines)
+
+    async def public_catalog(self) -> CatalogEntry:
+        entry = public_catalog_cache.get()
+        if entry is not None:
+            return entry
+        version = public_catalog_cache.version
+        items = await self.list_public_wines()
+        return public_catalog_cache.store(version, _wine_list_adapter.dump_json(items))
         
     
-    async def list_paginated_wines(self, current_user: UserSession, offset: int, limit: int) -> PaginatedWines:
+    async def search_public_wines(self, q: str, offset: int, limit: int) -> WineSearchResults:
+        version = public_catalog_cache.version
+        vocabulary = search_vocabulary.get(version)
+        if vocabulary is None:
+            vocabulary = search_vocabulary.store(version, await self.repo.search_terms())
+
+        match = build_match_query(q, vocabulary)
+        if match is None:
+            return WineSearchResults(query=q, total=0, offset=offset, limit=limit, items=[])
+        rows = await self.repo.search(match, limit=limit, offset=offset)
+        return WineSearchResults(
+            query=q,
+            total=rows[0][1] if rows else 0,
+            offset=offset,
+            limit=limit,
+            items=self._transform_wines_to_read([wine for wine, _ in rows]),
+        )
+
+    async def inventory_analytics(self, current_user: UserSession) -> InventoryAnalytics:
+        if current_user.role != "admin":
+            raise HTTPException(status_code=403, detail="Not authorized")
+
+        cached = inventory_analytics_cache.get(current_user.id)
+        if cached is not None:
+            return cached
+        generation = inventory_analytics_cache.generation(current_user.id)
+
+        breakdowns: Dict[str, List[InventoryBreakdown]] = {"location": [], "grape": [], "vintage": []}
+        totals = None
+        for dimension, key, label, wines, bottles, value_usd, low_stock, off_stock in await self.repo.inventory_summary(current_user.id):
+            row = InventoryBreakdown(key=str(key), label=label, wines=wines, bottles=bottles,
+                                     value_usd=round(value_usd, 2), low_stock=low_stock, off_stock=off_stock)
+            if dimension == "total":
+                totals = row
+            else:
+                breakdowns[dimension].append(row)
+
+        analytics = InventoryAnalytics(
+            wines=totals.wines,
+            bottles=totals.bottles,
+            value_usd=totals.value_usd,
+            low_stock=totals.low_stock,
+            off_stock=totals.off_stock,
+            by_location=sorted(breakdowns["location"], key=lambda row: (-row.value_usd, row.key)),
+            by_grape=sorted(breakdowns["grape"], key=lambda row: (-row.value_usd, row.key)),
+            by_vintage=sorted(breakdowns["vintage"], key=lambda row: row.key, reverse=True),
+            generated_at=datetime.now(),
+        )
+        return inventory_analytics_cache.store(current_user.id, generation, analytics)
+
+    async def list_paginated_wines(self, current_user: UserSession, offset: int, limit: int, filters: Optional[WineFilter] = None) -> PaginatedWines:
         if current_user.role != "admin":
             raise HTTPException(status_code=403, detail="Not authorized")
 
-        total = await self.repo.count_all(current_user.id)
-        wines = await self.repo.paginated(current_user.id, offset=offset, limit=limit)
-        items = [await self._transform_wine_to_read(wine) for wine in wines]
+        conditions = filters.model_dump() if filters else None
+        total = await self.repo.count_all(current_user.id, filters=conditions)
+        wines = await self.repo.paginated(current_user.id, offset=offset, limit=limit, filters=conditions)
+        items = self._transform_wines_to_read(wines)
 
         return PaginatedWines(total=total, offset=offset, limit=limit, items=items)
 
+    async def list_cursor_wines(self, current_user: UserSession, cursor: Optional[str], limit: int, include_total: bool = False, filters: Optional[WineFilter] = None) -> CursorPaginatedWines:
+        if current_user.role != "admin":
+            raise HTTPException(status_code=403, detail="Not authorized")
+        if filters and (filters.sort_by != "id" or filters.order != "asc"):
+            raise HTTPException(status_code=400, detail="Cursor pagination only supports sort_by=id&order=asc, use mode=offset")
+
+        conditions = filters.model_dump() if filters else None
+
+        direction, wine_id = _decode_cursor(cursor) if cursor else ("next", None)
+        if direction == "prev":
+            wines = await self.repo.keyset(current_user.id, before_id=wine_id, limit=limit, filters=conditions)
+            has_more = len(wines) > limit
+            wines = list(reversed(wines[:limit]))
+            prev_cursor = _encode_cursor("prev", wines[0].id) if has_more else None
+            next_cursor = _encode_cursor("next", wines[-1].id) if wines else None
+        else:
+            wines = await self.repo.keyset(current_user.id, after_id=wine_id, limit=limit, filters=conditions)
+            has_more = len(wines) > limit
+            wines = wines[:limit]
+            next_cursor = _encode_cursor("next", wines[-1].id) if has_more else None
+            prev_cursor = _encode_cursor("prev", wines[0].id) if wines and wine_id is not None else None
+
+        total = await self.repo.count_all(current_user.id, filters=conditions) if include_total else None
+        items = self._transform_wines_to_read(wines)
+
+        return CursorPaginatedWines(limit=limit, next_cursor=next_cursor, prev_cursor=prev_cursor, total=total, items=items)
+
+
+    @staticmethod
+    async def export_public_wines(fmt: str = "ndjson", chunk_size: int = 500) -> AsyncIterator[str]:
+        # owns its session: the request-scoped one is already closed while a StreamingResponse is being sent
+        async with async_session() as session:
+            repo = WineRepository(session)
+            fields = [name for name, field in WineRead.model_fields.items() if not field.exclude]
+            if fmt == "csv":
+                buffer = io.StringIO()
+                writer = csv.DictWriter(buffer, fieldnames=fields)
+                writer.writeheader()
+                yield buffer.getvalue()
+            async for wines in repo.stream(chunk_size=chunk_size):
+                items = WineServices._transform_wines_to_read(wines)
+                if fmt == "csv":
+                    buffer = io.StringIO()
+                    writer = csv.DictWriter(buffer, fieldnames=fields)
+                    writer.writerows(item.model_dump() for item in items)
+                    yield buffer.getvalue()
+                else:
+                    yield "".join(item.model_dump_json() + "\n" for item in items)
 
     async def get_by_id(self, wine_id: int, current_user: UserSession ) -> Optional[WineRead]:
         try:
             if current_user.role != "admin":
                 raise HTTPException(status_code=403,detail="you are not authorized to get a wine")
             wine = await self.repo.read_by_id(wine_id)
-            print(wine)
             if not wine:
                 raise WineNotFoundError(f"Wine with ID {wine_id} not found")
             
@@ -100,31 +285,33 @@ class WineServices:
         except Exception as e:
             raise WineServiceError(f"Error retrieving wine: {str(e)}")
 
-    async def update(self, wine_id: int, wine_update: WineUpdate, current_user: UserSession) -> Optional[WineRead]:
+    async def update_versioned(self, wine_id: int, wine_update: WineUpdate, versions: Optional[set[int]] = None) -> WineRead:
+        """Applies wine_update in one conditional UPDATE. Raises StaleWineError when the wine is no
+        longer at one of `versions` (None: any version), WineNotFoundError when it does not exist."""
+        if wine_update.location_code is not None:
+            location = await self.location_services.get_by_code(wine_update.location_code)
+            if not location:
+                raise HTTPException(status_code=400, detail="Location not found for wine")
+
+        updated_wine = await self.repo.update(wine_id, wine_update.model_dump(exclude_unset=True), versions)
+        if updated_wine is None:
+            if versions is not None and await self.repo.read_by_id_soft_delete(wine_id):
+                raise StaleWineError(f"Wine with ID {wine_id} changed since version {sorted(versions)}")
+            raise WineNotFoundError(f"Wine with ID {wine_id} not found")
+        self._wines_changed(updated_wine.user_id)
+        return await self._transform_wine_to_read(updated_wine)
+
+    async def update(self, wine_id: int, wine_update: WineUpdate, current_user: UserSession, if_match: Optional[str] = None) -> Optional[WineRead]:
         try:
             if current_user.role != "admin":
                 raise HTTPException(status_code=403,detail="you are not authorized to change wines")
-            wine = await self.repo.read_by_id_soft_delete(wine_id)
-            if not wine:
-                raise HTTPException(status_code=404, detail="Wine not found")
-            
-            update_data = wine_update.model_dump(exclude_unset=True)
-
-            if wine_update.location_code is not None:
-                location = await self.location_services.get_by_code(wine_update.location_code)
-                if not location:
-                    raise HTTPException(status_code=400, detail="Location not found for wine")
-
-            for key, value in wine_update.model_dump(exclude_unset=True).items():
-                setattr(wine, key, value)
-            
-            updated_wine = await self.repo.update(wine_id, wine)
-           
-            wine = await self._transform_wine_to_read(updated_wine)
-            return WineRead.model_validate(wine)
-            
+            return await self.update_versioned(wine_id, wine_update, _if_match_versions(if_match))
         except HTTPException:
             raise
+        except WineNotFoundError:
+            raise HTTPException(status_code=404, detail="Wine not found")
+        except StaleWineError:
+            raise HTTPException(status_code=412, detail="Wine was modified since it was read, fetch it again for the current ETag")
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error updating wine: {str(e)}")
     
@@ -156,15 +343,15 @@ class WineServices:
                 raise HTTPException(status_code=400, detail="Error creating wine")
             
             if wine.stock > 0:
-                print("codigo importante", wine.stock, wine.id, wine.location_code)
                 stock_movement = StockCreate(
                     delta=wine.stock,
                     wine_id=wine.id,
                     location_code=wine.location_code,
                     user_id=getattr(wine, "user_id", None)
                 )
-                await self.stock_movement_service.create(stock_movement)
+                await self.stock_movement_service.record(stock_movement)
 
+            self._wines_changed(wine.user_id)
             return await self._transform_wine_to_read(wine)
         except HTTPException:
             raise
@@ -174,6 +361,88 @@ class WineServices:
             raise HTTPException(status_code=500, detail=f"Error creating wine: {str(e)}")
 
 
+    async def bulk_import(self, rows: List[Dict[str, Any]], current_user: UserSession) -> WineImportReport:
+        if current_user.role != "admin":
+            raise HTTPException(status_code=403, detail="Only admin users can import wines")
+
+        results: List[WineImportRowResult] = []
+        valid: List[tuple[int, WineCreate]] = []
+        for index, row in enumerate(rows):
+            try:
+                data = dict(row)
+                if data.get("user_id") is None:
+                    data["user_id"] = current_user.id
+                wine_create = WineCreate.model_validate(data)
+                if wine_create.stock < 0:
+                    raise ValueError("Stock cannot be negative")
+                valid.append((index, wine_create))
+            except ValidationError as e:
+                errors = [f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors()]
+                results.append(WineImportRowResult(row=index, status="error", errors=errors))
+            except (ValueError, TypeError) as e:
+                results.append(WineImportRowResult(row=index, status="error", errors=[str(e)]))
+
+        # the (name, year, grape) key is unique: report duplicates per row instead of failing the batch
+        taken = await self.repo.existing_keys({(w.name, w.year, w.grape) for _, w in valid})
+        unique_rows: List[tuple[int, WineCreate]] = []
+        for index, wine_create in valid:
+            key = (wine_create.name, wine_create.year, wine_create.grape)
+            if key in taken:
+                results.append(WineImportRowResult(row=index, status="error", errors=["Wine with this name, year and grape already exists"]))
+            else:
+                taken.add(key)
+                unique_rows.append((index, wine_create))
+        valid = unique_rows
+
+        locations: Dict[str, str] = {}
+        for _, wine_create in valid:
+            locations.setdefault(wine_create.location_code, wine_create.location_description or "")
+
+        try:
+            locations_created = await self.location_repo.create_missing(
+                [{"code": code, "description": description} for code, description in locations.items()]
+            )
+            wine_ids = await self.repo.bulk_create(
+                [wine_create.model_dump(exclude={"location_description"}) for _, wine_create in valid]
+            )
+            await self.stock_movement_repo.bulk_create([
+                {
+                    "delta": wine_create.stock,
+                    "wine_id": wine_id,
+                    "location_code": wine_create.location_code,
+                    "user_id": wine_create.user_id,
+                }
+                for (_, wine_create), wine_id in zip(valid, wine_ids)
+                if wine_create.stock > 0
+            ])
+        except IntegrityError:
+            raise HTTPException(status_code=400, detail="Error of integrity, possibly a duplicate entry.")
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error importing wines: {str(e)}")
+
+        if locations:
+            self.uow.after_commit(lambda: location_registry.put_missing(locations))
+        if wine_ids:
+            self._wines_changed(*(wine_create.user_id for _, wine_create in valid))
+        results.extend(
+            WineImportRowResult(row=index, status="created", wine_id=wine_id)
+            for (index, _), wine_id in zip(valid, wine_ids)
+        )
+        results.sort(key=lambda result: result.row)
+        return WineImportReport(
+            received=len(rows),
+            created=len(wine_ids),
+            failed=len(rows) - len(wine_ids),
+            locations_created=max(locations_created, 0),
+            rows=results,
+        )
+
+    async def bulk_import_csv(self, content: str, current_user: UserSession) -> WineImportReport:
+        reader = csv.DictReader(io.StringIO(content))
+        # empty cells count as missing so required columns are reported instead of failing type coercion
+        rows = [{key: value for key, value in row.items() if key and value not in (None, "")} for row in reader]
+        return await self.bulk_import(rows, current_user)
+
     async def delete(self, wine_id: int, current_user: UserSession) -> JSONResponse:
         try:
             if current_user.role != "admin":
@@ -186,14 +455,16 @@ class WineServices:
             if not wine.is_available:
                 raise HTTPException(status_code=400, detail="Wine is already deleted")
             if wine.stock > 0:
+                # the remaining bottles leave the inventory with the wine
                 stock_movement = StockCreate(
-                    delta=wine.stock,
+                    delta=-wine.stock,
                     wine_id=wine.id,
                     location_code=wine.location_code,
                     user_id=getattr(wine, "user_id", None)
                 )
-                await self.stock_movement_service.create(stock_movement)
+                await self.stock_movement_service.record(stock_movement)
             await self.repo.delete(wine)
+            self._wines_changed(wine.user_id)
 
             return JSONResponse(content={"message": f"Wine '{wine.name}' was successfully deleted."},status_code=200)
         except HTTPException:
@@ -201,13 +472,110 @@ class WineServices:
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Error deleting wine: {str(e)}")
 
+    async def reassign_location(self, source_code: str, reassign: LocationReassign, current_user: UserSession) -> LocationReassignResult:
+        if current_user.role != "admin":
+            raise HTTPException(status_code=403, detail="Only admin users can move wines")
+        if reassign.target_code == source_code:
+            raise HTTPException(status_code=400, detail="Source and target location are the same")
+        found = await self.location_services.get_by_codes({source_code, reassign.target_code})
+        if len(found) < 2:
+            raise HTTPException(status_code=404, detail="Location not found")
+
+        moved = await self.repo.reassign_location(source_code, reassign.target_code, reassign.wine_ids)
+        if moved:
+            # the ledger keeps balances per location: the bottles leave the source and enter the target,
+            # written in this transaction so history never sees a wine at both or neither
+            now = datetime.now()
+            await self.stock_movement_repo.bulk_create([
+                dict(delta=delta, timestamp=now, comment=None, wine_id=wine_id, location_code=location_code, user_id=current_user.id)
+                for wine_id, _, stock in moved if stock
+                for delta, location_code in ((-stock, source_code), (stock, reassign.target_code))
+            ])
+            self._wines_changed(*(owner_id for _, owner_id, _ in moved))
+        return LocationReassignResult(source_code=source_code, target_code=reassign.target_code, moved=len(moved))
+
     async def set_stock(self, wine_id: int, stock_update: StockUpdate,current_user: UserSession) -> WineStockUpdate:
         if current_user.role != "admin":
             raise HTTPException(status_code=403, detail="Only admin users can update stock")
         if stock_update.stock < 0:
             raise HTTPException(status_code=400, detail="Stock can't be negative")       
-        wine = await self.repo.set_stock(wine_id, stock_update.stock)
-        if not wine:
-            raise HTTPException(status_code=404, detail="Wine not found")
+        for _ in range(SET_STOCK_ATTEMPTS):
+            previous = await self.repo.read_stock(wine_id)
+            if previous is None:
+                raise HTTPException(status_code=404, detail="Wine not found")
+            # another request may change the stock between the read and the conditional UPDATE: read again
+            changed = await self.repo.set_stock(wine_id, previous, stock_update.stock)
+            if changed:
+                break
+        else:
+            raise HTTPException(status_code=409, detail="Stock changed concurrently, try again")
+        location_code, owner_id = changed
+        if stock_update.stock != previous:
+            # the ledger gets the difference, so history and as-of reads end at the new stock
+            await self.stock_movement_service.record(StockCreate(
+                delta=stock_update.stock - previous,
+                wine_id=wine_id,
+                location_code=location_code,
+                user_id=current_user.id,
+            ))
+        self._wines_changed(owner_id)
         
-        return WineStockUpdate(stock=wine.stock)
+        return WineStockUpdate(stock=stock_update.stock)
+
+    async def adjust_stock(self, wine_id: int, stock_adjust: StockAdjust, current_user: UserSession) -> StockAdjustResult:
+        if current_user.role != "admin":
+            raise HTTPException(status_code=403, detail="Only admin users can update stock")
+        try:
+            adjusted = await self.repo.adjust_stock(wine_id, stock_adjust.delta)
+            if adjusted is None:
+                wine = await self.repo.read_by_id(wine_id)
+                if not wine:
+                    raise HTTPException(status_code=404, detail="Wine not found")
+                raise HTTPException(status_code=409, detail=f"Stock can't be negative (current stock: {wine.stock})")
+
+            stock, location_code, owner_id = adjusted
+            movement = await self.stock_movement_repo.add(StockMovement(
+                delta=stock_adjust.delta,
+                comment=stock_adjust.comment,
+                wine_id=wine_id,
+                location_code=location_code,
+                user_id=current_user.id,
+            ))
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Error adjusting stock: {str(e)}")
+
+        self._wines_changed(owner_id)
+        return StockAdjustResult(wine_id=wine_id, delta=stock_adjust.delta, stock=stock, movement_id=movement.id)
+
+
+T = TypeVar("T")
+
+async def retry_on_stale(operation: Callable[[WineServices], Awaitable[T]], attempts: int = 3, backoff: float = 0.02) -> T:
+    """Runs operation in its own unit of work and commits it, starting over in a fresh transaction
+    when a wine changed underneath it: StaleWineError, or SQLite refusing to turn a read snapshot
+    that is already stale into a write ("database is locked"). For internal read-modify-write
+    callers, which read the wine and pass its version to update_versioned:
+
+        async def raise_price(services: WineServices) -> WineRead:
+            wine = await services.repo.read_by_id(wine_id)
+            return await services.update_versioned(wine_id, WineUpdate(price_usd=wine.price_usd * 1.1), {wine.version})
+
+        await retry_on_stale(raise_price)
+    """
+    for attempt in range(1, attempts + 1):
+        async with async_session() as session:
+            uow = UnitOfWork(session)
+            try:
+                result = await operation(WineServices(uow))
+                await uow.commit()
+                return result
+            except (StaleWineError, OperationalError) as e:
+                await uow.rollback()
+                if attempt == attempts or (isinstance(e, OperationalError) and "locked" not in str(e)):
+                    raise
+            except Exception:
+                await uow.rollback()
+                raise
+        await asyncio.sleep(backoff * attempt)
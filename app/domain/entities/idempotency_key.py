@@ -0,0 +1,24 @@
+from typing import Optional
+from datetime import datetime
+from sqlalchemy import Index
+from sqlmodel import SQLModel, Field
+
+class IdempotencyKey(SQLModel, table=True):
+    """Response of a committed request sent with an Idempotency-Key header.
+
+    The row is claimed and completed in the same transaction as the request's
+    own writes, so a key is only visible once its effects are committed. A
+    retry with the same key replays status_code and body until expires_at.
+    """
+    __tablename__ = "idempotency_key"
+    __table_args__ = (
+        Index("ix_idempotency_key_expires_at", "expires_at"),
+    )
+
+    # "<method> <path> user <user id>:<client key>", so keys never collide across routes or users
+    key: str = Field(primary_key=True)
+    fingerprint: str = Field(nullable=False)
+    status_code: Optional[int] = None
+    body: Optional[str] = None
+    created_at: datetime = Field(nullable=False)
+    expires_at: datetime = Field(nullable=False)
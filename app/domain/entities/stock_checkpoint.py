@@ -0,0 +1,25 @@
+from typing import Optional
+from datetime import datetime
+from sqlalchemy import Index
+from sqlmodel import SQLModel, Field
+
+class StockCheckpoint(SQLModel, table=True):
+    """Balance of the stock_movement ledger per wine and location, for every movement before taken_at.
+
+    Each checkpoint run stores a complete balance table at one taken_at, so a
+    historical query reads the latest run before the requested time plus the
+    movements after it, instead of the whole ledger.
+    """
+    __tablename__ = "stock_checkpoint"
+    __table_args__ = (
+        Index("ix_stock_checkpoint_taken_at_wine_id", "taken_at", "wine_id"),
+        Index("ix_stock_checkpoint_wine_id_taken_at", "wine_id", "taken_at"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    taken_at: datetime = Field(nullable=False)
+    balance: int = Field(nullable=False)
+    movements: int = Field(default=0)
+
+    wine_id: int = Field(foreign_key="wine.id")
+    location_code: Optional[str] = Field(default=None, foreign_key="location.code")
@@ -1,5 +1,6 @@
 from typing import Optional
 from datetime import datetime
+from sqlalchemy import Index
 from sqlmodel import SQLModel, Field, Relationship
 from app.domain.entities.user import User
 from app.domain.entities.wine import Wine
@@ -7,6 +8,11 @@ from app.domain.entities.location import Location
 
 class StockMovement(SQLModel, table=True):
     __tablename__ = "stock_movement"
+    __table_args__ = (
+        Index("ix_stock_movement_wine_id_timestamp", "wine_id", "timestamp"),
+        Index("ix_stock_movement_location_code_timestamp", "location_code", "timestamp"),
+        Index("ix_stock_movement_timestamp", "timestamp"),
+    )
 
     
     id: Optional[int] = Field(default=None, primary_key=True)
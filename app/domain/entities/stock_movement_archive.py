@@ -0,0 +1,26 @@
+from typing import Optional
+from datetime import datetime
+from sqlalchemy import Index
+from sqlmodel import SQLModel, Field
+
+class StockMovementArchive(SQLModel, table=True):
+    """Movements moved out of stock_movement by ledger compaction, same ids and columns.
+
+    Balances before the compaction horizon live in stock_checkpoint; these rows
+    keep the detailed history queryable without weighing on the hot table.
+    """
+    __tablename__ = "stock_movement_archive"
+    __table_args__ = (
+        Index("ix_stock_movement_archive_wine_id_timestamp", "wine_id", "timestamp"),
+        Index("ix_stock_movement_archive_location_code_timestamp", "location_code", "timestamp"),
+        Index("ix_stock_movement_archive_timestamp", "timestamp"),
+    )
+
+    id: int = Field(primary_key=True)
+    delta: int = Field(nullable=False)
+    timestamp: datetime = Field(nullable=False)
+    comment: Optional[str] = None
+    wine_id: int
+    user_id: Optional[int] = None
+    location_code: Optional[str] = None
+    archived_at: datetime = Field(default_factory=datetime.now)
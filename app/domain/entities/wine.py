@@ -1,12 +1,29 @@
 from typing import Optional, List, TYPE_CHECKING
+from sqlalchemy import Index, text
 from sqlmodel import SQLModel, Field, Relationship
 if TYPE_CHECKING:
     from app.domain.entities.user import User
     from app.domain.entities.location import Location
     from app.domain.entities.stock_movement import StockMovement
 
+# below this many bottles a wine is "Low Stock"; shared by WineRead and the stock_status filter
+LOW_STOCK_THRESHOLD = 5
+
 class Wine(SQLModel, table=True):
     __tablename__ = "wine"
+    __table_args__ = (
+        Index("ix_wine_user_id_is_available", "user_id", "is_available"),
+        Index("ix_wine_location_code", "location_code"),
+        # per-location occupancy counted from the index alone; ix_wine_location_code keeps id order for listings
+        Index("ix_wine_location_code_is_available_stock", "location_code", "is_available", "stock"),
+        # README: a wine is uniquely defined by name, vintage and grape; soft-deleted rows don't count
+        Index("uq_wine_name_year_grape", "name", "year", "grape", unique=True, sqlite_where=text("is_available = 1")),
+        # owner-scoped listings filtered or sorted by one of these columns (WineFilter)
+        Index("ix_wine_user_id_is_available_grape_year", "user_id", "is_available", "grape", "year"),
+        Index("ix_wine_user_id_is_available_price_usd", "user_id", "is_available", "price_usd"),
+        Index("ix_wine_user_id_is_available_year", "user_id", "is_available", "year"),
+        Index("ix_wine_user_id_is_available_stock", "user_id", "is_available", "stock"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str = Field(nullable=False)
@@ -15,6 +32,8 @@ class Wine(SQLModel, table=True):
     price_usd: float = Field(nullable=False)
     stock: int = Field(default=0, ge=0)
     is_available: bool = Field(default=True)
+    # bumped by every UPDATE of the row; sent as the ETag and checked against If-Match (WineRepository.update)
+    version: int = Field(default=1, nullable=False, sa_column_kwargs={"server_default": text("1")})
 
     user_id: int = Field(foreign_key="user.id")
     location_code: str = Field(foreign_key="location.code")
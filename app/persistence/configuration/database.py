@@ -1,19 +1,125 @@
 from typing import AsyncGenerator
 from dotenv import load_dotenv
+from fastapi import Depends
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession,create_async_engine,async_sessionmaker
 import os
+from app.persistence.configuration.unit_of_work import UnitOfWork
 
 load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL")
-print(f"Connecting to database at {DATABASE_URL}")
+DB_PROFILE = os.getenv("DB_PROFILE", "development")
+print(f"Connecting to database at {DATABASE_URL} (profile: {DB_PROFILE})")
 
 
-engine = create_async_engine(DATABASE_URL, echo=True)
+# Engine profiles, selected with DB_PROFILE. Every value can be overridden by the
+# environment variable of the same name in upper case (e.g. SQLITE_SYNCHRONOUS=FULL).
+ENGINE_PROFILES = {
+    "development": {
+        "db_echo": True,
+        "db_pool_size": 5,
+        "db_max_overflow": 10,
+        "db_statement_cache_size": 128,
+        "sqlite_journal_mode": "WAL",
+        "sqlite_synchronous": "NORMAL",
+        "sqlite_busy_timeout": 5000,
+        "sqlite_cache_size": -16000,
+        "sqlite_mmap_size": 0,
+    },
+    "production": {
+        "db_echo": False,
+        "db_pool_size": 10,
+        "db_max_overflow": 20,
+        "db_statement_cache_size": 512,
+        "sqlite_journal_mode": "WAL",
+        "sqlite_synchronous": "NORMAL",
+        "sqlite_busy_timeout": 10000,
+        "sqlite_cache_size": -64000,
+        "sqlite_mmap_size": 268435456,
+    },
+    "test": {
+        "db_echo": False,
+        "db_pool_size": 2,
+        "db_max_overflow": 0,
+        "db_statement_cache_size": 64,
+        "sqlite_journal_mode": "WAL",
+        "sqlite_synchronous": "OFF",
+        "sqlite_busy_timeout": 5000,
+        "sqlite_cache_size": -8000,
+        "sqlite_mmap_size": 0,
+    },
+}
+
+
+def load_profile(name: str) -> dict:
+    if name not in ENGINE_PROFILES:
+        raise ValueError(f"Unknown DB_PROFILE '{name}', expected one of {sorted(ENGINE_PROFILES)}")
+    profile = {}
+    for key, default in ENGINE_PROFILES[name].items():
+        raw = os.getenv(key.upper())
+        if raw is None:
+            profile[key] = default
+        elif isinstance(default, bool):
+            profile[key] = raw.strip().lower() in ("1", "true", "yes", "on")
+        elif isinstance(default, int):
+            profile[key] = int(raw)
+        else:
+            profile[key] = raw.strip().upper()
+    return profile
+
+
+def _is_sqlite_memory(url: str) -> bool:
+    return url.startswith("sqlite") and (":memory:" in url or url.rstrip("/").endswith(":"))
+
+
+def build_engine(url: str, profile: dict):
+    engine_options = {
+        "echo": profile["db_echo"],
+        "query_cache_size": profile["db_statement_cache_size"] * 4,
+    }
+    if url.startswith("sqlite"):
+        # sqlite3's own prepared statement cache, per connection
+        engine_options["connect_args"] = {"cached_statements": profile["db_statement_cache_size"]}
+    if not _is_sqlite_memory(url):
+        engine_options["pool_size"] = profile["db_pool_size"]
+        engine_options["max_overflow"] = profile["db_max_overflow"]
+
+    new_engine = create_async_engine(url, **engine_options)
+
+    if url.startswith("sqlite"):
+        @event.listens_for(new_engine.sync_engine, "connect")
+        def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            if not _is_sqlite_memory(url):
+                cursor.execute(f"PRAGMA journal_mode={profile['sqlite_journal_mode']}")
+                cursor.execute(f"PRAGMA mmap_size={int(profile['sqlite_mmap_size'])}")
+            cursor.execute(f"PRAGMA synchronous={profile['sqlite_synchronous']}")
+            cursor.execute(f"PRAGMA busy_timeout={int(profile['sqlite_busy_timeout'])}")
+            cursor.execute(f"PRAGMA cache_size={int(profile['sqlite_cache_size'])}")
+            cursor.close()
+
+    return new_engine
+
+
+engine_profile = load_profile(DB_PROFILE)
+engine = build_engine(DATABASE_URL, engine_profile)
 async_session = async_sessionmaker(engine, expire_on_commit=False)
 
 
-async def get_db() -> AsyncGenerator[AsyncSession, None]:
+async def get_unit_of_work() -> AsyncGenerator[UnitOfWork, None]:
+    # FastAPI closes this before sending the response, so a failed commit is still a 500
     async with async_session() as session:
-        yield session
+        uow = UnitOfWork(session)
+        try:
+            yield uow
+            await uow.commit()
+        except Exception:
+            await uow.rollback()
+            raise
+
+
+async def get_db(uow: UnitOfWork = Depends(get_unit_of_work)) -> AsyncSession:
+    # dependencies are cached per request: current_user and the services share the session
+    return uow.session
 
 
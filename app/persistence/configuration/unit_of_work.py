@@ -0,0 +1,47 @@
+import inspect
+from typing import Any, Callable, List
+from sqlalchemy.ext.asyncio import AsyncSession
+
+
+class UnitOfWork:
+    """One transaction per request.
+
+    Repositories only flush; get_unit_of_work commits once after the endpoint
+    returns and rolls back if it raised, so a request's writes land together
+    or not at all. Work that must only see committed data (cache
+    invalidation, queued ledger rows) is registered with after_commit, and
+    work that must run either way (releasing an in-flight idempotency key)
+    with after_rollback as well.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self._after_commit: List[Callable[[], Any]] = []
+        self._after_rollback: List[Callable[[], Any]] = []
+
+    def after_commit(self, callback: Callable[[], Any]) -> None:
+        # callbacks may be coroutine functions; they are dropped on rollback
+        self._after_commit.append(callback)
+
+    def after_rollback(self, callback: Callable[[], Any]) -> None:
+        # also called when the commit itself fails
+        self._after_rollback.append(callback)
+
+    @staticmethod
+    async def _run(callbacks: List[Callable[[], Any]]) -> None:
+        for callback in callbacks:
+            result = callback()
+            if inspect.isawaitable(result):
+                await result
+
+    async def commit(self) -> None:
+        await self.session.commit()
+        callbacks, self._after_commit, self._after_rollback = self._after_commit, [], []
+        await self._run(callbacks)
+
+    async def rollback(self) -> None:
+        callbacks, self._after_commit, self._after_rollback = self._after_rollback, [], []
+        try:
+            await self.session.rollback()
+        finally:
+            await self._run(callbacks)
@@ -0,0 +1,38 @@
+from datetime import datetime
+from typing import Optional
+from sqlmodel import delete, select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.domain.entities.idempotency_key import IdempotencyKey
+
+class IdempotencyRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def read(self, key: str, now: datetime) -> Optional[IdempotencyKey]:
+        statement = select(IdempotencyKey).where(IdempotencyKey.key == key, IdempotencyKey.expires_at > now)
+        result = await self.session.execute(statement)
+        return result.scalar_one_or_none()
+
+    async def claim(self, key: str, fingerprint: str, now: datetime, expires_at: datetime) -> bool:
+        """Inserts the key, or takes over an expired row with it. No commit here.
+        False when a live row exists: another worker committed the same key first."""
+        table = IdempotencyKey.__table__
+        stmt = sqlite_insert(table).values(key=key, fingerprint=fingerprint, created_at=now, expires_at=expires_at)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["key"],
+            set_={"fingerprint": fingerprint, "status_code": None, "body": None, "created_at": now, "expires_at": expires_at},
+            where=table.c.expires_at <= now,
+        ).returning(table.c.key)
+        result = await self.session.execute(stmt)
+        return result.first() is not None
+
+    async def complete(self, key: str, status_code: int, body: str) -> None:
+        table = IdempotencyKey.__table__
+        await self.session.execute(update(table).where(table.c.key == key).values(status_code=status_code, body=body))
+
+    async def prune(self, before: datetime) -> int:
+        # range on ix_idempotency_key_expires_at; no commit here
+        table = IdempotencyKey.__table__
+        result = await self.session.execute(delete(table).where(table.c.expires_at <= before))
+        return result.rowcount
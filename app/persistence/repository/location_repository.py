@@ -1,8 +1,11 @@
 from typing import Optional, List
 from fastapi import HTTPException
-from sqlmodel import select
+from sqlmodel import delete, func, select
+from sqlalchemy import and_
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.domain.entities.location import Location
+from app.domain.entities.wine import Wine
 
 class LocationRepository:
     def __init__(self, session: AsyncSession):
@@ -10,10 +13,17 @@ class LocationRepository:
 
     async def create(self, location: Location) -> Location:
             self.session.add(location)
-            await self.session.commit()
-            await self.session.refresh(location)
+            await self.session.flush()
             return location
         
+    async def create_missing(self, locations: List[dict]) -> int:
+        # single INSERT ... ON CONFLICT DO NOTHING; the caller owns the transaction
+        if not locations:
+            return 0
+        stmt = sqlite_insert(Location).values(locations).on_conflict_do_nothing(index_elements=["code"])
+        result = await self.session.execute(stmt)
+        return result.rowcount
+
     async def read(self) -> List[Location]:
         statement = select(Location)
         result = await self.session.execute(statement)
@@ -30,16 +40,37 @@ class LocationRepository:
         return result.scalars().all()
 
 
+    async def occupancy(self, code: Optional[str] = None) -> List[tuple]:
+        # one GROUP BY over the location/wine join, counted from ix_wine_location_code_is_available_stock.
+        # Rows: (code, description, wines, bottles), empty locations included
+        stmt = (
+            select(Location.code, Location.description, func.count(Wine.id).label("wines"),
+                   func.coalesce(func.sum(Wine.stock), 0).label("bottles"))
+            .outerjoin(Wine, and_(Wine.location_code == Location.code, Wine.is_available == True))
+            # grouped on the primary key alone (description follows from it), so the groups come in index order
+            .group_by(Location.code)
+            .order_by(Location.code)
+        )
+        if code is not None:
+            stmt = stmt.where(Location.code == code)
+        result = await self.session.execute(stmt)
+        return result.all()
+
+    async def has_wines(self, code: str) -> bool:
+        # only available wines keep a location in use; soft-deleted ones are never moved and keep the code as history
+        stmt = select(select(Wine.id).where(Wine.location_code == code, Wine.is_available == True).exists())
+        result = await self.session.execute(stmt)
+        return result.scalar_one()
+
     async def update(self, location_code: str, location_update: Location) -> Optional[Location]:
         location = await self.read_by_code(location_code)
         for key, value in location_update.dict(exclude_unset=True).items():
             setattr(location, key, value)
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(location)
         return location
 
-    async def delete(self, location_code: str) -> Location:
-        location = await self(location_code)
-        await self.session.delete(location)
-        await self.session.commit()
-        return location
+    async def delete(self, location_code: str) -> None:
+        # a plain DELETE: the ORM would null location_code on the soft-deleted wines and ledger rows still
+        # pointing at it, losing their history. No commit here
+        await self.session.execute(delete(Location).where(Location.code == location_code))
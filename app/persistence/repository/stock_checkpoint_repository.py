@@ -0,0 +1,82 @@
+from datetime import datetime
+from typing import List, Optional
+from sqlmodel import delete, func, insert, select
+from sqlalchemy import exists, literal, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.domain.entities.stock_checkpoint import StockCheckpoint
+from app.persistence.repository.stock_movement_repository import ledger
+
+class StockCheckpointRepository:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def latest_run(self, at: datetime, wine_id: Optional[int] = None, strict: bool = False) -> Optional[datetime]:
+        # newest checkpoint run covering movements up to `at` (before it, when strict)
+        stmt = select(func.max(StockCheckpoint.taken_at))
+        stmt = stmt.where(StockCheckpoint.taken_at < at if strict else StockCheckpoint.taken_at <= at)
+        if wine_id is not None:
+            stmt = stmt.where(StockCheckpoint.wine_id == wine_id)
+        result = await self.session.execute(stmt)
+        return result.scalar_one_or_none()
+
+    async def wine_balance(self, wine_id: int, at: datetime) -> Optional[tuple[datetime, int]]:
+        # (taken_at, balance) of the newest run covering `at` for this wine, summed over its locations
+        latest = (select(func.max(StockCheckpoint.taken_at))
+                  .where(StockCheckpoint.wine_id == wine_id, StockCheckpoint.taken_at <= at)
+                  .scalar_subquery())
+        stmt = (select(StockCheckpoint.taken_at, func.sum(StockCheckpoint.balance))
+                .where(StockCheckpoint.wine_id == wine_id, StockCheckpoint.taken_at == latest)
+                .group_by(StockCheckpoint.taken_at))
+        result = await self.session.execute(stmt)
+        row = result.first()
+        return (row[0], row[1]) if row else None
+
+    async def create_run(self, taken_at: datetime) -> int:
+        """Stores the balance of every (wine, location) for movements before taken_at: the previous
+        run plus the movements since then. No commit here; a run that already exists is left alone."""
+        base = await self.latest_run(taken_at, strict=True)
+        # archived movements count too, so a run backfilled behind the compaction horizon stays exact
+        movements = ledger(since=base)
+        tail = select(movements.c.wine_id, movements.c.location_code,
+                      movements.c.delta.label("balance"), literal(1).label("movements"))
+        tail = tail.where(movements.c.timestamp < taken_at)
+        if base is not None:
+            previous = (select(StockCheckpoint.wine_id, StockCheckpoint.location_code,
+                               StockCheckpoint.balance, StockCheckpoint.movements)
+                        .where(StockCheckpoint.taken_at == base))
+            rows = union_all(previous, tail).subquery("rows")
+        else:
+            rows = tail.subquery("rows")
+
+        # the existence check runs inside the INSERT, under SQLite's write lock, so concurrent runs can't duplicate it
+        already_taken = exists().where(StockCheckpoint.taken_at == taken_at)
+        snapshot = (
+            select(literal(taken_at), rows.c.wine_id, rows.c.location_code,
+                   func.sum(rows.c.balance), func.sum(rows.c.movements))
+            .where(~already_taken)
+            .group_by(rows.c.wine_id, rows.c.location_code)
+        )
+        table = StockCheckpoint.__table__
+        result = await self.session.execute(
+            insert(table).from_select(
+                [table.c.taken_at, table.c.wine_id, table.c.location_code, table.c.balance, table.c.movements],
+                snapshot,
+            )
+        )
+        return result.rowcount
+
+    async def runs(self) -> List[tuple[datetime, int]]:
+        stmt = select(StockCheckpoint.taken_at, func.count()).group_by(StockCheckpoint.taken_at).order_by(StockCheckpoint.taken_at)
+        result = await self.session.execute(stmt)
+        return result.all()
+
+    async def prune_runs(self, before: datetime) -> int:
+        """Thins the runs older than `before` to the first run of each month; every run is a full
+        snapshot, so the ones left still answer any as-of read. No commit here."""
+        kept = (select(func.min(StockCheckpoint.taken_at))
+                .where(StockCheckpoint.taken_at < before)
+                .group_by(func.strftime("%Y-%m", StockCheckpoint.taken_at)))
+        result = await self.session.execute(
+            delete(StockCheckpoint).where(StockCheckpoint.taken_at < before, StockCheckpoint.taken_at.not_in(kept))
+        )
+        return result.rowcount
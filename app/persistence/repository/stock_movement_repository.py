@@ -1,26 +1,151 @@
+from datetime import datetime
 from typing import Optional, List
 from fastapi import HTTPException
-from sqlmodel import select
+from sqlmodel import delete, func, insert, select
+from sqlalchemy import Integer, case, cast, literal, union_all
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.domain.entities.stock_checkpoint import StockCheckpoint
 from app.domain.entities.stock_movement import StockMovement
+from app.domain.entities.stock_movement_archive import StockMovementArchive
 from app.domain.entities.wine import Wine
 
+LEDGER_COLUMNS = ("id", "timestamp", "delta", "comment", "wine_id", "user_id", "location_code")
+
+
+def ledger(wine_id: Optional[int] = None, location_code: Optional[str] = None, user_id: Optional[int] = None,
+           since: Optional[datetime] = None, until: Optional[datetime] = None):
+    """Live and compacted movements as one subquery; each branch is filtered on its own indexes."""
+    branches = []
+    for table in (StockMovement.__table__, StockMovementArchive.__table__):
+        stmt = select(*(table.c[name] for name in LEDGER_COLUMNS))
+        if wine_id is not None:
+            stmt = stmt.where(table.c.wine_id == wine_id)
+        if location_code is not None:
+            stmt = stmt.where(table.c.location_code == location_code)
+        if user_id is not None:
+            stmt = stmt.where(table.c.user_id == user_id)
+        if since is not None:
+            stmt = stmt.where(table.c.timestamp >= since)
+        if until is not None:
+            stmt = stmt.where(table.c.timestamp <= until)
+        branches.append(stmt)
+    return union_all(*branches).subquery("ledger")
+
 class StockMovementRepository:
     def __init__(self, session: AsyncSession):
         self.session = session
 
     async def create(self, movement: StockMovement) -> StockMovement:
             self.session.add(movement)
-            await self.session.commit()
-            await self.session.refresh(movement)
+            await self.session.flush()
             return movement
             
 
+    async def add(self, movement: StockMovement) -> StockMovement:
+        # flush only, so the movement commits together with the caller's stock change
+        self.session.add(movement)
+        await self.session.flush()
+        return movement
+
+    async def bulk_create(self, movements: List[dict]) -> None:
+        # executemany, no commit: used inside a caller-owned transaction
+        if movements:
+            await self.session.execute(insert(StockMovement.__table__), movements)
+
     async def read(self) -> List[StockMovement]:
         statement = select(StockMovement)
         result = await self.session.execute(statement)
         return result.scalars().all()
 
+    async def history(self, wine_id: int, since: Optional[datetime], start: Optional[datetime], end: datetime, limit: int) -> List[tuple]:
+        # running balance as a window sum over the movements after the checkpoint `since`;
+        # rows before `start` only feed the sum. Rows: (id, timestamp, delta, location_code, comment, running)
+        rows = ledger(wine_id=wine_id, since=since, until=end)
+        running = select(
+            rows.c.id, rows.c.timestamp, rows.c.delta, rows.c.location_code, rows.c.comment,
+            func.sum(rows.c.delta).over(order_by=(rows.c.timestamp, rows.c.id)).label("running"),
+        ).subquery("running")
+
+        stmt = select(running).order_by(running.c.timestamp, running.c.id).limit(limit)
+        if start is not None:
+            stmt = stmt.where(running.c.timestamp >= start)
+        result = await self.session.execute(stmt)
+        return result.all()
+
+    async def sum_deltas(self, wine_id: int, since: Optional[datetime], until: datetime) -> int:
+        rows = ledger(wine_id=wine_id, since=since, until=until)
+        result = await self.session.execute(select(func.coalesce(func.sum(rows.c.delta), 0)))
+        return result.scalar_one()
+
+    async def balances_as_of(self, run: Optional[datetime], at: datetime) -> List[tuple]:
+        # per-wine stock at `at`: the checkpoint run's balances plus the movements since the run.
+        # Rows: (wine_id, name, stock), wines with no bottles left are skipped
+        movements = ledger(since=run, until=at)
+        tail = select(movements.c.wine_id, movements.c.delta)
+        if run is not None:
+            checkpoint = (select(StockCheckpoint.wine_id, StockCheckpoint.balance.label("delta"))
+                          .where(StockCheckpoint.taken_at == run))
+            rows = union_all(checkpoint, tail).subquery("rows")
+        else:
+            rows = tail.subquery("rows")
+
+        stock = func.sum(rows.c.delta)
+        stmt = (
+            select(rows.c.wine_id, Wine.name, stock.label("stock"))
+            .join(Wine, Wine.id == rows.c.wine_id)
+            .group_by(rows.c.wine_id, Wine.name)
+            .having(stock != 0)
+            .order_by(rows.c.wine_id)
+        )
+        result = await self.session.execute(stmt)
+        return result.all()
+
+    async def series(self, origin: datetime, end: datetime, unit_seconds: Optional[int], step: int,
+                     wine_id: Optional[int] = None, location_code: Optional[str] = None, user_id: Optional[int] = None) -> List[tuple]:
+        """Deltas grouped into buckets of `step` units from `origin`, in SQL. unit_seconds None means calendar months.
+        Rows: (bucket index, inflow, outflow, net, movements), empty buckets are not returned."""
+        rows = ledger(wine_id=wine_id, location_code=location_code, user_id=user_id, since=origin, until=end)
+        ts = rows.c.timestamp
+        if unit_seconds is None:
+            months = cast(func.strftime("%Y", ts), Integer) * 12 + cast(func.strftime("%m", ts), Integer) - 1
+            bucket = (months - (origin.year * 12 + origin.month - 1)) // step
+        else:
+            # integer epoch seconds: exact bucket edges, no julianday rounding
+            origin_epoch = int((origin - datetime(1970, 1, 1)).total_seconds())
+            bucket = (cast(func.strftime("%s", ts), Integer) - origin_epoch) // (unit_seconds * step)
+
+        stmt = (
+            select(
+                bucket.label("bucket"),
+                func.sum(case((rows.c.delta > 0, rows.c.delta), else_=0)).label("inflow"),
+                func.sum(case((rows.c.delta < 0, -rows.c.delta), else_=0)).label("outflow"),
+                func.sum(rows.c.delta).label("net"),
+                func.count().label("movements"),
+            )
+            .group_by(bucket)
+            .order_by(bucket)
+        )
+        result = await self.session.execute(stmt)
+        return result.all()
+
+    async def archive_before(self, cutoff: datetime, batch_size: int) -> int:
+        """Moves up to batch_size movements older than cutoff to stock_movement_archive. No commit here,
+        so the caller keeps each batch a short write transaction."""
+        ids = (await self.session.execute(
+            select(StockMovement.id).where(StockMovement.timestamp < cutoff).order_by(StockMovement.timestamp).limit(batch_size)
+        )).scalars().all()
+        if not ids:
+            return 0
+        live, archive = StockMovement.__table__, StockMovementArchive.__table__
+        await self.session.execute(
+            insert(archive).from_select(
+                [archive.c[name] for name in LEDGER_COLUMNS] + [archive.c.archived_at],
+                select(*(live.c[name] for name in LEDGER_COLUMNS), literal(datetime.now())).where(live.c.id.in_(ids)),
+            )
+        )
+        await self.session.execute(delete(live).where(live.c.id.in_(ids)))
+        return len(ids)
+
     async def read_by_id(self, movement_id: int) -> Optional[StockMovement]:
         statement = select(StockMovement).where(StockMovement.id == movement_id)
         result = await self.session.execute(statement)
@@ -32,6 +157,6 @@ class StockMovementRepository:
             raise HTTPException(status_code=404, detail="Stock movement not found")
         for key, value in movement_update.dict(exclude_unset=True).items():
             setattr(movement, key, value)
-        await self.session.commit()
+        await self.session.flush()
         await self.session.refresh(movement)
         return movement
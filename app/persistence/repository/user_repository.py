@@ -16,8 +16,7 @@ class UserRepository:
 
     async def create(self, user: User) -> User:
         self.session.add(user)
-        await self.session.commit()
-        await self.session.refresh(user)
+        await self.session.flush()
         return user
         
     async def read(self) -> List[User]:
@@ -34,20 +33,17 @@ class UserRepository:
         result = await self.session.execute(statement)
         return result.scalar_one_or_none()
 
-    async def update(self, user: User) -> Optional[User]:
-        try:
-            self.session.add(user)
-            await self.session.commit()
-            await self.session.refresh(user)
-            return user
-        except Exception:
-            await self.session.rollback()
+    async def update(self, user: User) -> User:
+        # errors propagate: the unit of work rolls the whole request back
+        self.session.add(user)
+        await self.session.flush()
+        await self.session.refresh(user)
+        return user
 
     async def delete(self, user: User) -> User:
             user.is_active = False
             self.session.add(user)
-            await self.session.commit()
-            await self.session.refresh(user)
+            await self.session.flush()
             return user
         
         
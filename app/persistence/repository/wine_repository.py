@@ -1,15 +1,70 @@
-from typing import Optional, List
+from typing import AsyncIterator, Optional, List
 from fastapi import HTTPException
-from sqlmodel import func, select
+from sqlmodel import func, insert, select, update
+from sqlalchemy import String, and_, case, cast, column, literal, literal_column, null, table, text, union_all
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.domain.entities.wine import Wine
+from sqlalchemy.orm import joinedload
+from app.domain.entities.location import Location
+from app.domain.entities.wine import LOW_STOCK_THRESHOLD, Wine
+
+# FTS5 tables created by migration 3 (helpers/migrations.py), kept in sync with wine by triggers
+wine_fts = table("wine_fts")
+wine_fts_vocab = table("wine_fts_vocab", column("term"))
+
+
+def wine_read_options():
+    # many-to-one relations needed by the WineRead projection, loaded in the same SELECT
+    return (joinedload(Wine.user), joinedload(Wine.location))
+
+SORT_COLUMNS = {"id": Wine.id, "price": Wine.price_usd, "year": Wine.year, "stock": Wine.stock}
+
+
+def stock_status_clause(status: str):
+    # SQL side of the stock_status computed for WineRead, a range on wine.stock
+    if status == "off":
+        return Wine.stock == 0
+    if status == "low":
+        return and_(Wine.stock > 0, Wine.stock < LOW_STOCK_THRESHOLD)
+    return Wine.stock >= LOW_STOCK_THRESHOLD
+
+
+def apply_filters(stmt, filters: Optional[dict]):
+    # filters: WineFilter.model_dump(); each one is a WHERE clause served by the ix_wine_user_id_is_available_* indexes
+    if not filters:
+        return stmt
+    if filters.get("grape") is not None:
+        stmt = stmt.where(Wine.grape == filters["grape"])
+    if filters.get("year_min") is not None:
+        stmt = stmt.where(Wine.year >= filters["year_min"])
+    if filters.get("year_max") is not None:
+        stmt = stmt.where(Wine.year <= filters["year_max"])
+    if filters.get("price_min") is not None:
+        stmt = stmt.where(Wine.price_usd >= filters["price_min"])
+    if filters.get("price_max") is not None:
+        stmt = stmt.where(Wine.price_usd <= filters["price_max"])
+    if filters.get("location_code") is not None:
+        stmt = stmt.where(Wine.location_code == filters["location_code"])
+    if filters.get("stock_status") is not None:
+        stmt = stmt.where(stock_status_clause(filters["stock_status"]))
+    return stmt
+
+
+def apply_sort(stmt, filters: Optional[dict]):
+    # id breaks ties in the same direction, so a backwards index scan still covers the ORDER BY
+    filters = filters or {}
+    column = SORT_COLUMNS[filters.get("sort_by") or "id"]
+    columns = [column] if column is Wine.id else [column, Wine.id]
+    if filters.get("order") == "desc":
+        columns = [column.desc() for column in columns]
+    return stmt.order_by(*columns)
+
 
 class WineRepository:
     def __init__(self, session: AsyncSession):
         self.session: AsyncSession = session
 
     async def read_by_id(self, id: int) -> Optional[Wine]:
-        statement = (select(Wine).where(Wine.id == id).where(Wine.is_available == True))
+        statement = (select(Wine).options(*wine_read_options()).where(Wine.id == id).where(Wine.is_available == True))
         result = await self.session.execute(statement)
         return result.scalar_one_or_none()
     async def read_by_id_soft_delete(self, id: int) -> Optional[Wine]:
@@ -17,62 +72,205 @@ class WineRepository:
         result = await self.session.execute(statement)
         return result.scalar_one_or_none()
     
-    async def update(self, id: int, wine: Wine) -> Wine:
-        existing_wine: Optional[Wine] = await self.read_by_id(id)
-        for key, value in wine.model_dump(exclude_unset=True).items():
-            setattr(existing_wine, key, value)
-        await self.session.commit()
-        await self.session.refresh(existing_wine)
-        return existing_wine
-
-    async def read(self) -> List[Wine]:
-        statement = select(Wine).where(Wine.is_available == True)
-        result = await self.session.execute(statement)
+    async def update(self, id: int, values: dict, versions: Optional[set[int]] = None) -> Optional[Wine]:
+        """One conditional UPDATE ... RETURNING: applies values and bumps version, only while the row
+        still has one of `versions` (any version when None). No commit here; None when no row matched."""
+        stmt = (
+            update(Wine)
+            .where(Wine.id == id)
+            .values(**values, version=Wine.version + 1)
+            .returning(Wine)
+            .execution_options(populate_existing=True)
+        )
+        if versions is not None:
+            stmt = stmt.where(Wine.version.in_(versions))
+        result = await self.session.execute(stmt)
+        return result.scalar_one_or_none()
+
+    async def read(self, user_id: Optional[int] = None, filters: Optional[dict] = None) -> List[Wine]:
+        stmt = select(Wine).options(*wine_read_options()).where(Wine.is_available == True)
+        if user_id is not None:
+            stmt = stmt.where(Wine.user_id == user_id)
+        result = await self.session.execute(apply_sort(apply_filters(stmt, filters), filters))
         return result.scalars().all()
-    
-    async def read(self, user_id: Optional[int] = None) -> List[Wine]:
-        stmt = select(Wine).where(Wine.is_available == True)
+
+    async def stream(self, user_id: Optional[int] = None, chunk_size: int = 500) -> AsyncIterator[List[Wine]]:
+        # server-side cursor: rows are fetched chunk_size at a time instead of materialising the whole table
+        stmt = select(Wine).options(*wine_read_options()).where(Wine.is_available == True)
         if user_id is not None:
             stmt = stmt.where(Wine.user_id == user_id)
+        stmt = stmt.order_by(Wine.id).execution_options(yield_per=chunk_size)
+
+        result = await self.session.stream(stmt)
+        async for chunk in result.scalars().partitions():
+            yield chunk
+
+    async def search(self, match: str, limit: int = 10, offset: int = 0) -> List[tuple[Wine, int]]:
+        # one query: FTS5 match ranked by bm25 (name weighs more than grape), relations and the total via a window count.
+        # bm25() only works in the query that scans wine_fts, hence the subquery.
+        matches = (
+            select(literal_column("rowid").label("wine_id"), literal_column("bm25(wine_fts, 10.0, 5.0)").label("score"))
+            .select_from(wine_fts)
+            .where(text("wine_fts MATCH :match").bindparams(match=match))
+            .subquery("matches")
+        )
+        stmt = (
+            select(Wine, func.count().over().label("total"))
+            .join(matches, matches.c.wine_id == Wine.id)
+            .options(*wine_read_options())
+            .where(Wine.is_available == True)
+            .order_by(matches.c.score, Wine.id)
+            .offset(offset)
+            .limit(limit)
+        )
         result = await self.session.execute(stmt)
+        return result.tuples().all()
+
+    async def search_terms(self) -> List[str]:
+        result = await self.session.execute(select(wine_fts_vocab.c.term))
         return result.scalars().all()
 
     async def create(self, wine: Wine) -> Wine:
             self.session.add(wine)
-            await self.session.commit()
-            await self.session.refresh(wine)
+            await self.session.flush()
             return wine
             
 
+    async def existing_keys(self, keys: set[tuple[str, int, str]]) -> set[tuple[str, int, str]]:
+        # (name, year, grape) keys already taken by available wines, looked up through uq_wine_name_year_grape
+        if not keys:
+            return set()
+        stmt = (
+            select(Wine.name, Wine.year, Wine.grape)
+            .where(Wine.is_available == True)
+            .where(Wine.name.in_({name for name, _, _ in keys}))
+        )
+        result = await self.session.execute(stmt)
+        return {tuple(row) for row in result.all()} & keys
+
+    async def bulk_create(self, wines: List[dict]) -> List[int]:
+        # executemany on the Core table (batched multi-VALUES), no commit here.
+        # sort_by_parameter_order is ~10x slower on sqlite; rowids are assigned in
+        # ascending insert order inside one write transaction, so sorting restores input order.
+        if not wines:
+            return []
+        table = Wine.__table__
+        result = await self.session.execute(insert(table).returning(table.c.id), wines)
+        return sorted(result.scalars().all())
+
     async def delete(self, wine: Wine) -> Wine:
         wine.is_available = False
         wine.stock = 0
+        wine.version += 1
         self.session.add(wine)
-        await self.session.commit()
-        await self.session.refresh(wine)
+        await self.session.flush()
         return wine
 
-    async def count_all(self, user_id: Optional[int] = None) -> int:
+    async def count_all(self, user_id: Optional[int] = None, filters: Optional[dict] = None) -> int:
         stmt = select(func.count()).select_from(Wine).where(Wine.is_available == True)
         if user_id:
             stmt = stmt.where(Wine.user_id == user_id)
+        stmt = apply_filters(stmt, filters)
         result = await self.session.execute(stmt)
         return result.scalar_one()
     
-    async def paginated(self,user_id: Optional[int] = None,offset: int = 0,limit: int = 10) -> List[Wine]:
-        stmt = select(Wine).where(Wine.is_available == True)
+    async def paginated(self,user_id: Optional[int] = None,offset: int = 0,limit: int = 10, filters: Optional[dict] = None) -> List[Wine]:
+        stmt = select(Wine).options(*wine_read_options()).where(Wine.is_available == True)
         if user_id:
             stmt = stmt.where(Wine.user_id == user_id)
-        stmt = stmt.offset(offset).limit(limit)
+        stmt = apply_sort(apply_filters(stmt, filters), filters).offset(offset).limit(limit)
+
+        result = await self.session.execute(stmt)
+        return result.scalars().all()
+
+    async def keyset(self, user_id: Optional[int] = None, after_id: Optional[int] = None, before_id: Optional[int] = None, limit: int = 10, filters: Optional[dict] = None) -> List[Wine]:
+        # seeks on the primary key instead of skipping rows; fetches limit + 1 so the caller knows if there is more
+        stmt = select(Wine).options(*wine_read_options()).where(Wine.is_available == True)
+        if user_id:
+            stmt = stmt.where(Wine.user_id == user_id)
+        stmt = apply_filters(stmt, filters)
+        if before_id is not None:
+            stmt = stmt.where(Wine.id < before_id).order_by(Wine.id.desc())
+        else:
+            if after_id is not None:
+                stmt = stmt.where(Wine.id > after_id)
+            stmt = stmt.order_by(Wine.id)
+        stmt = stmt.limit(limit + 1)
 
         result = await self.session.execute(stmt)
         return result.scalars().all()
     
-    async def set_stock(self, wine_id: int, new_stock: int) -> Wine:
-        statement = select(Wine).where(Wine.id == wine_id)
-        result = await self.session.execute(statement)
-        wine = result.scalar_one_or_none()
-        wine.stock = new_stock
-        await self.session.commit()
-        await self.session.refresh(wine)
-        return wine
+    async def inventory_summary(self, user_id: int) -> List[tuple]:
+        # one round trip: the totals row plus the location, grape and vintage GROUP BYs as UNION ALL branches.
+        # rows are (dimension, key, label, wines, bottles, value_usd, low_stock, off_stock)
+        def measures():
+            return (
+                func.count(Wine.id).label("wines"),
+                func.coalesce(func.sum(Wine.stock), 0).label("bottles"),
+                func.coalesce(func.sum(Wine.price_usd * Wine.stock), 0.0).label("value_usd"),
+                func.count(case((stock_status_clause("low"), 1))).label("low_stock"),
+                func.count(case((stock_status_clause("off"), 1))).label("off_stock"),
+            )
+
+        owned = (Wine.user_id == user_id, Wine.is_available == True)
+        stmt = union_all(
+            select(literal("total").label("dimension"), null().label("key"), null().label("label"), *measures())
+            .where(*owned),
+            select(literal("location"), Wine.location_code, Location.description, *measures())
+            .outerjoin(Location, Location.code == Wine.location_code)
+            .where(*owned).group_by(Wine.location_code, Location.description),
+            select(literal("grape"), Wine.grape, null(), *measures())
+            .where(*owned).group_by(Wine.grape),
+            select(literal("vintage"), cast(Wine.year, String), null(), *measures())
+            .where(*owned).group_by(Wine.year),
+        )
+        result = await self.session.execute(stmt)
+        return result.all()
+
+    async def read_stock(self, wine_id: int) -> Optional[int]:
+        statement = select(Wine.stock).where(Wine.id == wine_id, Wine.is_available == True)
+        return (await self.session.execute(statement)).scalar_one_or_none()
+
+    async def set_stock(self, wine_id: int, previous: int, new_stock: int) -> Optional[tuple[str, int]]:
+        # SQLite's RETURNING only sees the new row, so the caller reads the previous stock first and the
+        # UPDATE is conditioned on it; no commit here. Returns (location_code, user_id), or None when the
+        # wine is gone or its stock is no longer `previous`
+        table = Wine.__table__
+        stmt = (
+            update(table)
+            .where(table.c.id == wine_id, table.c.is_available == True, table.c.stock == previous)
+            .values(stock=new_stock, version=table.c.version + 1)
+            .returning(table.c.location_code, table.c.user_id)
+        )
+        result = await self.session.execute(stmt)
+        row = result.first()
+        return (row.location_code, row.user_id) if row else None
+
+    async def reassign_location(self, source_code: str, target_code: str, wine_ids: Optional[List[int]] = None) -> List[tuple[int, Optional[int], int]]:
+        # one UPDATE for every available wine at source_code (or the listed ones), no commit here.
+        # Returns (id, user_id, stock) of the moved wines
+        table = Wine.__table__
+        stmt = (
+            update(table)
+            .where(table.c.location_code == source_code, table.c.is_available == True)
+            .values(location_code=target_code, version=table.c.version + 1)
+            .returning(table.c.id, table.c.user_id, table.c.stock)
+        )
+        if wine_ids is not None:
+            stmt = stmt.where(table.c.id.in_(wine_ids))
+        result = await self.session.execute(stmt)
+        return result.all()
+
+    async def adjust_stock(self, wine_id: int, delta: int) -> Optional[tuple[int, str, int]]:
+        # atomic stock = stock + delta, refused when it would go negative; no commit here.
+        # returns (new_stock, location_code, user_id) or None when no row matched
+        table = Wine.__table__
+        stmt = (
+            update(table)
+            .where(table.c.id == wine_id, table.c.is_available == True, table.c.stock + delta >= 0)
+            .values(stock=table.c.stock + delta, version=table.c.version + 1)
+            .returning(table.c.stock, table.c.location_code, table.c.user_id)
+        )
+        result = await self.session.execute(stmt)
+        row = result.first()
+        return (row.stock, row.location_code, row.user_id) if row else None
@@ -1,13 +1,41 @@
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from .router.routes.api_dashboard import DashboardRouter
-from helpers.start_db import start_db
 from fastapi import Request
 from fastapi.responses import JSONResponse
 
+from app.persistence.configuration.database import DATABASE_URL, engine, engine_profile
+from helpers.idempotency import idempotency_cache
+from helpers.ledger import checkpoint_scheduler
+from helpers.metrics import MetricsMiddleware, install_sql_hooks
+from helpers.movement_writer import movement_writer
+from helpers.password_hasher import password_hasher
+from helpers.startup import run_startup
 
-start_db() 
-app = FastAPI(title="Vinoteca Dashboard API")
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    timings = await run_startup(app, engine, DATABASE_URL, engine_profile["db_pool_size"])
+    # the full breakdown is served by GET /startup
+    logger.info("Startup finished in %s ms", timings["total_ms"])
+    movement_writer.start()
+    checkpoint_scheduler.start()
+    idempotency_cache.start()
+    yield
+    await idempotency_cache.stop()
+    await checkpoint_scheduler.stop()
+    await movement_writer.stop()
+    password_hasher.shutdown()
+    await engine.dispose()
+
+
+app = FastAPI(title="Vinoteca Dashboard API", lifespan=lifespan)
 app.include_router(DashboardRouter.router)
+app.add_middleware(MetricsMiddleware)
+install_sql_hooks(engine)
 
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
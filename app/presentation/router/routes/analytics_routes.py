@@ -0,0 +1,21 @@
+from fastapi import APIRouter, Depends, status
+
+from app.application.dtos.user.user_credentials import UserSession
+from app.application.dtos.wine.wine_analytics import InventoryAnalytics
+from app.application.services.wine_services import WineServices
+from app.persistence.configuration.database import get_unit_of_work
+from app.persistence.configuration.unit_of_work import UnitOfWork
+from helpers.auth_user import current_user
+
+class AnalyticsRouter:
+    router = APIRouter(prefix="/analytics", tags=["analytics"])
+
+    def get_wine_service(uow: UnitOfWork = Depends(get_unit_of_work)):
+        return WineServices(uow)
+
+    @router.get("", response_model=InventoryAnalytics, status_code=status.HTTP_200_OK)
+    async def inventory_analytics(
+        service: WineServices = Depends(get_wine_service),
+        current_user: UserSession = Depends(current_user)
+    ):
+        return await service.inventory_analytics(current_user)
@@ -1,13 +1,38 @@
 from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
 
+from helpers.analytics_cache import inventory_analytics_cache
+from helpers.catalog_cache import public_catalog_cache
+from helpers.idempotency import idempotency_cache
+from helpers.ledger import checkpoint_scheduler
+from helpers.location_registry import location_registry
+from helpers.metrics import metrics_registry
+from helpers.movement_writer import movement_writer
+from helpers.password_hasher import password_hasher
+from helpers.search import search_vocabulary
+from helpers.startup import startup_timings
+from helpers.user_cache import active_user_cache
 
-
+from .analytics_routes import AnalyticsRouter
 from .user_routes import UserRouter
 from .location_routes import LocationRouter 
 from .stock_movement import StockMovementRouter
 from .user_for_authentication import UserForAuthenticationRouter
 from .wine_routes import WineRouter
 
+def _component_stats() -> dict:
+    return {
+        "active_users": active_user_cache.stats(),
+        "password_hasher": password_hasher.stats(),
+        "public_catalog": public_catalog_cache.stats(),
+        "inventory_analytics": inventory_analytics_cache.stats(),
+        "location_registry": location_registry.stats(),
+        "ledger_checkpoints": checkpoint_scheduler.stats(),
+        "movement_writer": movement_writer.stats(),
+        "idempotency_keys": idempotency_cache.stats(),
+        "search_vocabulary": search_vocabulary.stats(),
+    }
+
 class DashboardRouter:
     
     router = APIRouter(prefix="/api/dashboard", tags=["All endpoints"])
@@ -20,9 +45,25 @@ class DashboardRouter:
     async def info():
         return {"info": "Dashboard API for winery management"}
 
+    @router.get("/startup", summary="Startup timings")
+    async def startup():
+        return startup_timings
+
+    @router.get("/cache-stats", summary="Cache statistics")
+    async def cache_stats():
+        return _component_stats()
+
+    @router.get("/metrics", summary="Prometheus metrics", response_class=PlainTextResponse)
+    async def metrics():
+        return PlainTextResponse(
+            metrics_registry.render(_component_stats()),
+            media_type="text/plain; version=0.0.4",
+        )
+
     router.include_router(UserForAuthenticationRouter.router)
     router.include_router(UserRouter.router)
     router.include_router(WineRouter.router)
-    # router.include_router(LocationRouter.router)
-    # router.include_router(StockMovementRouter.router)
+    router.include_router(AnalyticsRouter.router)
+    router.include_router(LocationRouter.router)
+    router.include_router(StockMovementRouter.router)
 
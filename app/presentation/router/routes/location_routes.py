@@ -1,6 +1,74 @@
-from fastapi import APIRouter, Depends
-from typing import Annotated
+from fastapi import APIRouter, Depends, status
+from typing import List
+
+from app.application.dtos.location.location_for_create import LocationForCreate
+from app.application.dtos.location.location_for_read import LocationForRead
+from app.application.dtos.location.location_for_update import LocationForUpdate
+from app.application.dtos.location.location_occupancy import LocationOccupancy
+from app.application.dtos.location.location_reassign import LocationReassign, LocationReassignResult
+from app.application.dtos.user.user_credentials import UserSession
+from app.application.services.location_services import LocationServices
+from app.application.services.wine_services import WineServices
+from app.persistence.configuration.database import get_unit_of_work
+from app.persistence.configuration.unit_of_work import UnitOfWork
+from helpers.auth_user import current_user
 
 
 class LocationRouter:
-    router = APIRouter(prefix="/locations", tags=["locations"])
\ No newline at end of file
+    router = APIRouter(prefix="/locations", tags=["locations"])
+
+    def get_location_service(uow: UnitOfWork = Depends(get_unit_of_work)):
+        return LocationServices(uow)
+
+    def get_wine_service(uow: UnitOfWork = Depends(get_unit_of_work)):
+        return WineServices(uow)
+
+    @router.get("/", response_model=List[LocationOccupancy], status_code=status.HTTP_200_OK)
+    async def list_locations(
+        service: LocationServices = Depends(get_location_service),
+        current_user: UserSession = Depends(current_user)
+    ):
+        return await service.occupancy(current_user)
+
+    @router.get("/{location_code}", response_model=LocationOccupancy, status_code=status.HTTP_200_OK)
+    async def get_location(
+        location_code: str,
+        service: LocationServices = Depends(get_location_service),
+        current_user: UserSession = Depends(current_user)
+    ):
+        return (await service.occupancy(current_user, location_code))[0]
+
+    @router.post("/", response_model=LocationForRead, status_code=status.HTTP_201_CREATED)
+    async def create_location(
+        location: LocationForCreate,
+        service: LocationServices = Depends(get_location_service),
+        current_user: UserSession = Depends(current_user)
+    ):
+        return await service.create_location(location, current_user)
+
+    @router.patch("/{location_code}", response_model=LocationForRead, status_code=status.HTTP_200_OK)
+    async def update_location(
+        location_code: str,
+        location_update: LocationForUpdate,
+        service: LocationServices = Depends(get_location_service),
+        current_user: UserSession = Depends(current_user)
+    ):
+        return await service.update(location_code, location_update, current_user)
+
+    @router.post("/{location_code}/reassign", response_model=LocationReassignResult, status_code=status.HTTP_200_OK)
+    async def reassign_wines(
+        location_code: str,
+        reassign: LocationReassign,
+        service: WineServices = Depends(get_wine_service),
+        current_user: UserSession = Depends(current_user)
+    ):
+        return await service.reassign_location(location_code, reassign, current_user)
+
+    @router.delete("/{location_code}", status_code=status.HTTP_200_OK)
+    async def delete_location(
+        location_code: str,
+        service: LocationServices = Depends(get_location_service),
+        current_user: UserSession = Depends(current_user)
+    ):
+        await service.delete(location_code, current_user)
+        return {"message": f"Location '{location_code}' was successfully deleted."}
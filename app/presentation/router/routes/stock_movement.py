@@ -1,8 +1,33 @@
-from fastapi import APIRouter, Depends
-from typing import Annotated
+from datetime import datetime
+from fastapi import APIRouter, Depends, Query, status
+from typing import Annotated, Optional
+
+from app.application.dtos.stock_movement.movement_series import MovementSeries
+from app.application.dtos.user.user_credentials import UserSession
+from app.application.services.stock_movement import StockMovementService
+from app.persistence.configuration.database import get_unit_of_work
+from app.persistence.configuration.unit_of_work import UnitOfWork
+from helpers.auth_user import current_user
+from helpers.ledger import local_time
 
 
 class StockMovementRouter:
     router = APIRouter(prefix="/stock_movements", tags=["stock_movements"])
 
-   
+    def get_stock_movement_service(uow: UnitOfWork = Depends(get_unit_of_work)):
+        return StockMovementService(uow)
+
+    @router.get("/series", response_model=MovementSeries, status_code=status.HTTP_200_OK)
+    async def movement_series(
+        bucket: str = Query("day", pattern="^(hour|day|week|month)$"),
+        start: Optional[datetime] = Query(None, description="Defaults to max_points buckets before end"),
+        end: Optional[datetime] = Query(None, description="Defaults to now"),
+        max_points: int = Query(200, gt=0, le=1000, description="Longer ranges are downsampled to wider buckets"),
+        wine_id: Optional[int] = Query(None),
+        location_code: Optional[str] = Query(None),
+        user_id: Optional[int] = Query(None),
+        service: StockMovementService = Depends(get_stock_movement_service),
+        current_user: UserSession = Depends(current_user)
+    ):
+        return await service.movement_series(current_user, bucket=bucket, start=local_time(start), end=local_time(end), max_points=max_points,
+                                             wine_id=wine_id, location_code=location_code, user_id=user_id)
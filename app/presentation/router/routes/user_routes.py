@@ -1,9 +1,9 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.responses import JSONResponse
 from pydantic import ValidationError
-from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-from app.persistence.configuration.database import get_db
+from app.persistence.configuration.database import get_unit_of_work
+from app.persistence.configuration.unit_of_work import UnitOfWork
 from app.application.services.user_service import UserService
 from app.application.dtos.user.user_for_view import UserRead
 from app.application.dtos.user.user_for_create import UserForCreate
@@ -13,8 +13,8 @@ from helpers.auth_user import current_user
 class UserRouter:
     router = APIRouter(prefix="/users", tags=["users"])
 
-    def get_user_service(db: AsyncSession = Depends(get_db)):
-        return UserService(db)
+    def get_user_service(uow: UnitOfWork = Depends(get_unit_of_work)):
+        return UserService(uow)
 
     @router.get("/", response_model=List[UserRead])
     async def list_users(
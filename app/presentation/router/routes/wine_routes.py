@@ -1,73 +1,221 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Body, Depends, File, Header, HTTPException, Query, Response, UploadFile, status
+from datetime import datetime
+from typing import Any, Dict, List, Literal, Optional, Union
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+from fastapi.responses import JSONResponse, StreamingResponse
 
 from app.application.dtos.stock_movement.stock_for_update import StockUpdate
+from app.application.dtos.stock_movement.stock_for_adjust import StockAdjust, StockAdjustResult
 from app.application.dtos.wine.wine_for_update_stock import WineStockUpdate
-from app.application.dtos.wine.wine_paginated import PaginatedWines
-from app.persistence.configuration.database import get_db
-from app.application.services.wine_services import WineServices
+from app.application.dtos.wine.wine_bulk_import import WineImportReport
+from app.application.dtos.wine.wine_paginated import CursorPaginatedWines, PaginatedWines
+from app.application.dtos.wine.wine_search import WineSearchResults
+from app.application.dtos.wine.wine_filter import WineFilter
+from app.application.dtos.stock_movement.inventory_history import InventoryAsOf, InventoryHistory
+from app.application.services.idempotency_services import IdempotencyService
+from app.application.services.stock_movement import StockMovementService
+from app.persistence.configuration.database import get_unit_of_work
+from app.persistence.configuration.unit_of_work import UnitOfWork
+from app.application.services.wine_services import WineServices, wine_etag
 from app.application.dtos.wine.wine_for_view import WineRead
 from app.application.dtos.wine.wine_for_create import WineCreate
 from app.application.dtos.wine.wine_for_update import WineUpdate
 from app.application.dtos.user.user_credentials import UserSession
 from helpers.auth_user import current_user  
+from helpers.catalog_cache import public_catalog_cache
+from helpers.ledger import local_time
 
 class WineRouter:
     router = APIRouter(prefix="/wines", tags=["wines"])
 
-    def get_wine_service(db: AsyncSession = Depends(get_db)):
-        return WineServices(db, db)
+    def get_wine_service(uow: UnitOfWork = Depends(get_unit_of_work)):
+        return WineServices(uow)
+
+    def get_stock_movement_service(uow: UnitOfWork = Depends(get_unit_of_work)):
+        return StockMovementService(uow)
+
+    def get_idempotency_service(uow: UnitOfWork = Depends(get_unit_of_work)):
+        return IdempotencyService(uow)
+
+    def get_wine_filters(
+        grape: Optional[str] = Query(None),
+        year_min: Optional[int] = Query(None),
+        year_max: Optional[int] = Query(None),
+        price_min: Optional[float] = Query(None, ge=0),
+        price_max: Optional[float] = Query(None, ge=0),
+        location_code: Optional[str] = Query(None),
+        stock_status: Optional[Literal["off", "low", "good"]] = Query(None, description="off: 0, low: below 5, good: 5 or more"),
+        sort_by: Literal["id", "price", "year", "stock"] = Query("id"),
+        order: Literal["asc", "desc"] = Query("asc"),
+    ) -> WineFilter:
+        try:
+            return WineFilter(grape=grape, year_min=year_min, year_max=year_max, price_min=price_min, price_max=price_max,
+                              location_code=location_code, stock_status=stock_status, sort_by=sort_by, order=order)
+        except ValidationError as e:
+            raise RequestValidationError(e.errors(include_url=False))
     
-    @router.get("/paginated-wines", response_model=PaginatedWines)
+    @router.get("/paginated-wines", response_model=Union[PaginatedWines, CursorPaginatedWines])
     async def list_paginated_wines(
         offset: int = Query(0, ge=0),
         limit: int = Query(10, gt=0, le=100),
+        mode: str = Query("offset", pattern="^(offset|cursor)$", description="'cursor' switches to keyset pagination"),
+        cursor: Optional[str] = Query(None, description="next_cursor / prev_cursor from a previous cursor page"),
+        include_total: bool = Query(False, description="Only used in cursor mode"),
+        filters: WineFilter = Depends(get_wine_filters),
         service: WineServices = Depends(get_wine_service),
         current_user: UserSession = Depends(current_user)
     ):
-        return await service.list_paginated_wines(current_user, offset=offset, limit=limit)
+        if mode == "cursor" or cursor is not None:
+            return await service.list_cursor_wines(current_user, cursor=cursor, limit=limit, include_total=include_total, filters=filters)
+        return await service.list_paginated_wines(current_user, offset=offset, limit=limit, filters=filters)
 
 
     @router.get("/", response_model=List[WineRead])
     async def list_wines(
+        filters: WineFilter = Depends(get_wine_filters),
         service: WineServices = Depends(get_wine_service),
         current_user: UserSession = Depends(current_user)
         ):
-        return await service.list_wines(current_user)
+        return await service.list_wines(current_user, filters)
     
     @router.get("/public", response_model=list[WineRead], status_code=status.HTTP_200_OK)
-    async def list_public_wines(service: WineServices = Depends(get_wine_service)):
-        return await service.list_public_wines()
+    async def list_public_wines(
+        service: WineServices = Depends(get_wine_service),
+        if_none_match: Optional[str] = Header(None),
+    ):
+        catalog = await service.public_catalog()
+        headers = {"ETag": catalog.etag, "Cache-Control": "no-cache"}
+        if public_catalog_cache.matches(if_none_match, catalog.etag):
+            public_catalog_cache.not_modified += 1
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(content=catalog.body, media_type="application/json", headers=headers)
+
+
+    @router.get("/search", response_model=WineSearchResults, status_code=status.HTTP_200_OK)
+    async def search_public_wines(
+        q: str = Query(..., min_length=1, max_length=200, description="Words of the name or grape; prefixes and small typos match"),
+        offset: int = Query(0, ge=0),
+        limit: int = Query(10, gt=0, le=100),
+        service: WineServices = Depends(get_wine_service),
+    ):
+        return await service.search_public_wines(q, offset=offset, limit=limit)
+
+
+    @router.get("/export", status_code=status.HTTP_200_OK)
+    async def export_public_wines(
+        format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    ) -> StreamingResponse:
+        # no service dependency: the export streams from its own session, a request-scoped one would sit idle
+        if format == "csv":
+            return StreamingResponse(WineServices.export_public_wines("csv"), media_type="text/csv",
+                                     headers={"Content-Disposition": 'attachment; filename="wines.csv"'})
+        return StreamingResponse(WineServices.export_public_wines("ndjson"), media_type="application/x-ndjson")
+
+
+    @router.get("/inventory", response_model=InventoryAsOf, status_code=status.HTTP_200_OK)
+    async def inventory_as_of(
+        as_of: Optional[datetime] = Query(None, description="Defaults to now"),
+        service: StockMovementService = Depends(get_stock_movement_service),
+        current_user: UserSession = Depends(current_user)
+    ):
+        return await service.inventory_as_of(current_user, local_time(as_of))
 
 
     @router.get("/{wine_id}", response_model=WineRead)
-    async def get_wine(wine_id: int, service: WineServices = Depends(get_wine_service),current_user: UserSession = Depends(current_user) ):
+    async def get_wine(wine_id: int, response: Response, service: WineServices = Depends(get_wine_service),current_user: UserSession = Depends(current_user) ):
             wine = await service.get_by_id(wine_id, current_user)
             if not wine:
                 raise HTTPException(status_code=404, detail="Wine not found")
+            response.headers["ETag"] = wine_etag(wine.version)
             return wine
     
 
     @router.post("/", response_model=WineRead, status_code=status.HTTP_201_CREATED)
-    async def create_wine(wine: WineCreate,service: WineServices = Depends(get_wine_service)):
-        return await service.create(wine)
+    async def create_wine(
+        wine: WineCreate,
+        service: WineServices = Depends(get_wine_service),
+        idempotency: IdempotencyService = Depends(get_idempotency_service),
+        idempotency_key: Optional[str] = Header(None, min_length=1, max_length=255),
+    ):
+        if idempotency_key is None:
+            return await service.create(wine)
+        # the route is not authenticated: the owner in the body is the caller the key is scoped to
+        return await idempotency.run(idempotency_key, f"POST /wines/ user {wine.user_id}", wine, lambda: service.create(wine),
+                                     status_code=status.HTTP_201_CREATED)
+
+    @router.post("/bulk", response_model=WineImportReport, status_code=status.HTTP_200_OK)
+    async def bulk_import_wines(
+        rows: List[Dict[str, Any]] = Body(..., description="Array of WineCreate objects, validated row by row"),
+        service: WineServices = Depends(get_wine_service),
+        current_user: UserSession = Depends(current_user)
+    ):
+        return await service.bulk_import(rows, current_user)
+
+    @router.post("/bulk/csv", response_model=WineImportReport, status_code=status.HTTP_200_OK)
+    async def bulk_import_wines_csv(
+        file: UploadFile = File(..., description="CSV with a header row using the WineCreate field names"),
+        service: WineServices = Depends(get_wine_service),
+        current_user: UserSession = Depends(current_user)
+    ):
+        try:
+            content = (await file.read()).decode("utf-8-sig")
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=400, detail="CSV file must be UTF-8 encoded")
+        return await service.bulk_import_csv(content, current_user)
 
     @router.patch("/{wine_id}", response_model=WineRead)
-    async def update_wine(wine_id: int, wine_update: WineUpdate, service: WineServices = Depends(get_wine_service), current_user: UserSession = Depends(current_user)):
-        return await service.update(wine_id, wine_update,current_user)
+    async def update_wine(
+        wine_id: int,
+        wine_update: WineUpdate,
+        response: Response,
+        service: WineServices = Depends(get_wine_service),
+        current_user: UserSession = Depends(current_user),
+        if_match: Optional[str] = Header(None, description="ETag from GET /wines/{wine_id}; a stale one gets 412"),
+    ):
+        wine = await service.update(wine_id, wine_update, current_user, if_match)
+        response.headers["ETag"] = wine_etag(wine.version)
+        return wine
 
     @router.delete("/{wine_id}", status_code=status.HTTP_200_OK)
     async def delete_wine(wine_id: int, service: WineServices = Depends(get_wine_service), current_user: UserSession = Depends(current_user)) -> JSONResponse:
         return await service.delete(wine_id, current_user)
     
+    @router.get("/{wine_id}/inventory-history", response_model=InventoryHistory, status_code=status.HTTP_200_OK)
+    async def inventory_history(
+        wine_id: int,
+        start: Optional[datetime] = Query(None, description="Defaults to the first movement"),
+        end: Optional[datetime] = Query(None, description="Defaults to now"),
+        limit: int = Query(500, gt=0, le=5000),
+        service: StockMovementService = Depends(get_stock_movement_service),
+        current_user: UserSession = Depends(current_user)
+    ):
+        return await service.wine_history(wine_id, current_user, start=local_time(start), end=local_time(end), limit=limit)
+
     @router.put("/{wine_id}/stock", response_model=WineStockUpdate, status_code=status.HTTP_200_OK)
     async def set_stock(
         wine_id: int,
         stock_update: StockUpdate,
         service: WineServices = Depends(get_wine_service),
-        current_user: UserSession = Depends(current_user)
+        idempotency: IdempotencyService = Depends(get_idempotency_service),
+        current_user: UserSession = Depends(current_user),
+        idempotency_key: Optional[str] = Header(None, min_length=1, max_length=255),
     ):
-        return await service.set_stock(wine_id, stock_update,current_user)
+        if idempotency_key is None:
+            return await service.set_stock(wine_id, stock_update,current_user)
+        return await idempotency.run(idempotency_key, f"PUT /wines/{wine_id}/stock user {current_user.id}", stock_update,
+                                     lambda: service.set_stock(wine_id, stock_update, current_user))
 
+    @router.post("/{wine_id}/stock/adjust", response_model=StockAdjustResult, status_code=status.HTTP_200_OK)
+    async def adjust_stock(
+        wine_id: int,
+        stock_adjust: StockAdjust,
+        service: WineServices = Depends(get_wine_service),
+        idempotency: IdempotencyService = Depends(get_idempotency_service),
+        current_user: UserSession = Depends(current_user),
+        idempotency_key: Optional[str] = Header(None, min_length=1, max_length=255),
+    ):
+        if idempotency_key is None:
+            return await service.adjust_stock(wine_id, stock_adjust, current_user)
+        return await idempotency.run(idempotency_key, f"POST /wines/{wine_id}/stock/adjust user {current_user.id}", stock_adjust,
+                                     lambda: service.adjust_stock(wine_id, stock_adjust, current_user))
@@ -0,0 +1,59 @@
+"""Diffs two result files written by benchmarks.run.
+
+    python -m benchmarks.compare before.json after.json [--threshold 10]
+
+Exits with status 1 when a route's p95 latency or queries per request grew by
+more than the threshold (percent), so it can gate a CI job.
+"""
+import argparse
+import json
+import sys
+
+METRICS = ("p50_ms", "p95_ms", "p99_ms", "throughput_rps", "queries_per_request")
+
+
+def _change(before: float, after: float) -> float:
+    if before == 0:
+        return 0.0 if after == 0 else float("inf")
+    return (after - before) / before * 100
+
+
+def compare(before: dict, after: dict, threshold: float) -> list:
+    regressions = []
+    print(f"{'route (after, change vs before)':60} " + " ".join(f"{metric:>22}" for metric in METRICS))
+    for route in sorted(set(before["routes"]) | set(after["routes"])):
+        old, new = before["routes"].get(route), after["routes"].get(route)
+        if old is None or new is None:
+            print(f"{route:60} {'only in ' + ('after' if old is None else 'before'):>22}")
+            continue
+        cells = []
+        for metric in METRICS:
+            change = _change(old[metric], new[metric])
+            cells.append(f"{new[metric]:g} ({change:+.0f}%)".rjust(22))
+        print(f"{route:60} " + " ".join(cells))
+        for metric in ("p95_ms", "queries_per_request"):
+            if _change(old[metric], new[metric]) > threshold:
+                regressions.append(f"{route}: {metric} {old[metric]} → {new[metric]}")
+    return regressions
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0)
+    args = parser.parse_args(argv)
+    with open(args.before) as handle:
+        before = json.load(handle)
+    with open(args.after) as handle:
+        after = json.load(handle)
+    print(f"before: {before['meta']['commit']} {before['meta']['created_at']}   "
+          f"after: {after['meta']['commit']} {after['meta']['created_at']}")
+    regressions = compare(before, after, args.threshold)
+    if regressions:
+        print("\nRegressions:\n  " + "\n  ".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""Drives every DashboardRouter route in-process and records latency and SQL per request.
+
+    python -m benchmarks.seed --db bench.db
+    python -m benchmarks.run --db bench.db --requests 200 --concurrency 8 --out before.json
+    python -m benchmarks.compare before.json after.json
+
+The seeded database is copied first, so write routes never touch the seed.
+Requests go through httpx's ASGI transport (no network, no uvicorn) with the
+application's lifespan running, and SQL statements are counted with a
+cursor-execute hook on the application engine.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+PASSWORD = "TestPass123"
+
+
+def _wine_row(i: int, tag: str) -> dict:
+    return {"name": f"Bench {tag} {i}", "year": 2015, "grape": "Malbec", "price_usd": 21.5, "stock": 12,
+            "is_available": True, "location_code": "A1"}
+
+
+# (method, route path) -> builds the request for iteration i. Reads first, writes after, deletes last.
+SCENARIOS = {
+    ("GET", "/api/dashboard/healthcheck"): lambda i, ctx: {},
+    ("GET", "/api/dashboard/info"): lambda i, ctx: {},
+    ("GET", "/api/dashboard/startup"): lambda i, ctx: {},
+    ("GET", "/api/dashboard/cache-stats"): lambda i, ctx: {},
+    ("GET", "/api/dashboard/metrics"): lambda i, ctx: {},
+    ("GET", "/api/dashboard/analytics"): lambda i, ctx: {"auth": True},
+    ("GET", "/api/dashboard/users/"): lambda i, ctx: {"auth": True},
+    ("GET", "/api/dashboard/users/{user_id}"): lambda i, ctx: {"auth": True, "path": {"user_id": 1 + i % ctx["users"]}},
+    ("GET", "/api/dashboard/wines/"): lambda i, ctx: {"auth": True},
+    ("GET", "/api/dashboard/wines/public"): lambda i, ctx: {},
+    ("GET", "/api/dashboard/wines/paginated-wines"): lambda i, ctx: {
+        "auth": True, "params": {"offset": (i * 10) % max(ctx["wines"] // ctx["users"], 1), "limit": 10}},
+    ("GET", "/api/dashboard/wines/search"): lambda i, ctx: {
+        "params": {"q": ("malbec", "cab sauv", "chardonay", "reserva malbek")[i % 4], "limit": 20}},
+    ("GET", "/api/dashboard/wines/export"): lambda i, ctx: {"params": {"format": "ndjson" if i % 2 else "csv"}},
+    ("GET", "/api/dashboard/wines/inventory"): lambda i, ctx: {"auth": True, "params": {"as_of": f"{2022 + i % 4}-06-01T00:00:00"}},
+    ("GET", "/api/dashboard/wines/{wine_id}/inventory-history"): lambda i, ctx: {
+        "auth": True, "path": {"wine_id": 1 + i % ctx["wines"]}, "params": {"start": "2024-01-01T00:00:00"}},
+    ("GET", "/api/dashboard/wines/{wine_id}"): lambda i, ctx: {"auth": True, "path": {"wine_id": 1 + i % ctx["wines"]}},
+    ("GET", "/api/dashboard/locations/"): lambda i, ctx: {"auth": True},
+    ("GET", "/api/dashboard/locations/{location_code}"): lambda i, ctx: {"auth": True, "path": {"location_code": f"A{i % 10}"}},
+    ("GET", "/api/dashboard/stock_movements/series"): lambda i, ctx: {"auth": True, "params": [
+        {"bucket": "day"}, {"bucket": "month", "start": "2020-01-01T00:00:00"},
+        {"bucket": "week", "wine_id": 1 + i % ctx["wines"], "start": "2020-01-01T00:00:00", "max_points": 100}][i % 3]},
+    ("POST", "/api/dashboard/authenticate/login"): lambda i, ctx: {
+        "data": {"username": ctx["username"], "password": PASSWORD}},
+    ("POST", "/api/dashboard/users/"): lambda i, ctx: {"json": {
+        "username": f"bench_{ctx['run']}_{i}", "password": PASSWORD, "first_name": "Bench", "last_name": "User", "role": "user"}},
+    ("PUT", "/api/dashboard/users/{user_id}"): lambda i, ctx: {"auth": True, "path": {"user_id": ctx["users"]}, "json": {
+        "username": f"user{ctx['users']}", "last_name": f"Last{i}", "role": "user", "is_active": True, "password": PASSWORD}},
+    ("POST", "/api/dashboard/locations/"): lambda i, ctx: {"auth": True, "json": {
+        "code": f"Z{ctx['run']}{i}", "description": f"Bench {ctx['run']} {i}"}},
+    ("POST", "/api/dashboard/wines/"): lambda i, ctx: {"auth": True, "json": dict(_wine_row(i, ctx["run"]), user_id=ctx["user_id"])},
+    ("POST", "/api/dashboard/wines/bulk"): lambda i, ctx: {
+        "auth": True, "json": [_wine_row(i * 100 + n, ctx["run"] + "b") for n in range(100)]},
+    ("POST", "/api/dashboard/wines/bulk/csv"): lambda i, ctx: {"auth": True, "files": {"file": ("wines.csv", "\n".join(
+        ["name,year,grape,price_usd,stock,is_available,location_code"]
+        + [f"Bench {ctx['run']}c {i * 100 + n},2016,Syrah,18.0,6,true,B1" for n in range(100)]), "text/csv")}},
+    ("PATCH", "/api/dashboard/wines/{wine_id}"): lambda i, ctx: {
+        "auth": True, "path": {"wine_id": 1 + i % ctx["wines"]}, "json": {"price_usd": 10 + i % 50}},
+    # every request is sent twice with the same Idempotency-Key, as a client retrying after a timeout would
+    ("PUT", "/api/dashboard/wines/{wine_id}/stock"): lambda i, ctx: {
+        "auth": True, "path": {"wine_id": 1 + i // 2 % ctx["wines"]}, "json": {"stock": 10 + i // 2 % 20},
+        "headers": {"Idempotency-Key": f"{ctx['run']}-{i // 2}"}},
+    ("POST", "/api/dashboard/wines/{wine_id}/stock/adjust"): lambda i, ctx: {
+        "auth": True, "path": {"wine_id": 1 + i % ctx["wines"]}, "json": {"delta": 1 if i % 2 else -1}},
+    ("DELETE", "/api/dashboard/wines/{wine_id}"): lambda i, ctx: {"auth": True, "path": {"wine_id": ctx["wines"] - i}},
+    ("DELETE", "/api/dashboard/users/{user_id}"): lambda i, ctx: {"auth": True, "path": {"user_id": ctx["users"] - 1 - i % 3}},
+}
+
+
+def _percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * q
+    low = int(k)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (k - low)
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def _run(db_copy: str, requests: int, concurrency: int, only: list) -> dict:
+    import httpx
+    from sqlalchemy import event, func, select
+
+    from app.presentation.main import app
+    from app.persistence.configuration.database import async_session, engine
+    from app.domain.entities.user import User
+    from app.domain.entities.wine import Wine
+
+    statements = {"count": 0}
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements["count"] += 1
+
+    event.listen(engine.sync_engine, "before_cursor_execute", count)
+
+    routes = []
+    for route in app.routes:
+        if route.path.startswith("/api/dashboard"):
+            for method in sorted(route.methods - {"HEAD"}):
+                routes.append((method, route.path))
+
+    results, skipped = {}, []
+    async with app.router.lifespan_context(app):
+        async with async_session() as session:
+            admin = (await session.execute(
+                select(User).where(User.role == "admin", User.is_active == True).order_by(User.id).limit(1))).scalar_one()
+            ctx = {
+                "run": uuid.uuid4().hex[:6],
+                "username": admin.username,
+                "user_id": admin.id,
+                "users": (await session.execute(select(func.count()).select_from(User))).scalar_one(),
+                "wines": (await session.execute(select(func.max(Wine.id)))).scalar_one() or 1,
+            }
+
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            login = await client.post("/api/dashboard/authenticate/login",
+                                      data={"username": ctx["username"], "password": PASSWORD})
+            login.raise_for_status()
+            auth = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+            ordered = [key for key in SCENARIOS if key in routes] + [key for key in routes if key not in SCENARIOS]
+            for key in ordered:
+                method, path = key
+                name = f"{method} {path}"
+                if key not in SCENARIOS:
+                    skipped.append(name)
+                    continue
+                if only and not any(part in name for part in only):
+                    continue
+
+                latencies, statuses = [], {}
+                queue = asyncio.Queue()
+                for i in range(requests):
+                    queue.put_nowait(i)
+
+                async def worker():
+                    while not queue.empty():
+                        i = queue.get_nowait()
+                        spec = SCENARIOS[key](i, ctx)
+                        url = path.format(**spec.get("path", {}))
+                        headers = dict(auth if spec.get("auth") else {}, **spec.get("headers", {}))
+                        started = time.perf_counter()
+                        response = await client.request(
+                            method, url, params=spec.get("params"), json=spec.get("json"), data=spec.get("data"),
+                            files=spec.get("files"), headers=headers)
+                        await response.aread()
+                        latencies.append((time.perf_counter() - started) * 1000)
+                        statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+
+                statements["count"] = 0
+                started = time.perf_counter()
+                await asyncio.gather(*(worker() for _ in range(concurrency)))
+                elapsed = time.perf_counter() - started
+                results[name] = {
+                    "requests": requests,
+                    "status": statuses,
+                    "p50_ms": round(_percentile(latencies, 0.50), 3),
+                    "p95_ms": round(_percentile(latencies, 0.95), 3),
+                    "p99_ms": round(_percentile(latencies, 0.99), 3),
+                    "mean_ms": round(sum(latencies) / len(latencies), 3),
+                    "throughput_rps": round(requests / elapsed, 2),
+                    "queries_per_request": round(statements["count"] / requests, 2),
+                }
+                print(f"{name:60} p50 {results[name]['p50_ms']:>9.2f} ms  p99 {results[name]['p99_ms']:>9.2f} ms  "
+                      f"{results[name]['throughput_rps']:>9.1f} rps  {results[name]['queries_per_request']:>7.2f} q/req  "
+                      f"{statuses}", file=sys.stderr)
+    return {"context": {k: v for k, v in ctx.items() if k != "run"}, "routes": results, "skipped": skipped}
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="bench.db", help="database created by benchmarks.seed")
+    parser.add_argument("--requests", type=int, default=100, help="requests per route")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--profile", default="production", help="DB_PROFILE used by the application")
+    parser.add_argument("--only", action="append", default=[], help="substring filter on 'METHOD /path', repeatable")
+    parser.add_argument("--out", default="bench_results.json")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="winery-bench-")
+    db_copy = os.path.join(workdir, "bench.db")
+    shutil.copy(args.db, db_copy)
+    # the application reads its configuration at import time
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{db_copy}"
+    os.environ["DB_PROFILE"] = args.profile
+    os.environ.setdefault("DB_ECHO", "false")
+
+    try:
+        report = asyncio.run(_run(db_copy, args.requests, args.concurrency, args.only))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    report["meta"] = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "seed_db": os.path.abspath(args.db),
+        "requests_per_route": args.requests,
+        "concurrency": args.concurrency,
+        "profile": args.profile,
+        "python": platform.python_version(),
+    }
+    with open(args.out, "w") as handle:
+        json.dump(report, handle, indent=2, sort_keys=True)
+    if report["skipped"]:
+        print(f"No scenario for: {', '.join(report['skipped'])}", file=sys.stderr)
+    print(f"Results written to {args.out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
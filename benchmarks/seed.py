@@ -0,0 +1,147 @@
+"""Generates a synthetic winery database for benchmarks.
+
+    python -m benchmarks.seed --db bench.db --users 50 --locations 200 --wines 20000 --movements 2000000
+
+Every user gets the password TestPass123. Stock movements are generated per
+wine as a ledger whose running sum never goes negative, and each wine's
+stock is the sum of its movements.
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+GRAPES = ["Malbec", "Cabernet Sauvignon", "Merlot", "Syrah", "Pinot Noir", "Bonarda", "Torrontés",
+          "Chardonnay", "Sauvignon Blanc", "Tempranillo", "Petit Verdot", "Cabernet Franc", "Barbera"]
+WORDS = ["Reserva", "Gran", "Andino", "Finca", "Norte", "Valle", "Alto", "Clásico", "Viejo", "Roble",
+         "Premium", "Joven", "Patagonia", "Lujan", "Uco", "Cafayate", "Selección", "Familia"]
+PASSWORD = "TestPass123"
+
+
+def _create_schema(path: str) -> None:
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{path}"
+    from helpers.start_db import start_db
+
+    start_db()
+
+
+def seed(path: str, users: int, locations: int, wines: int, movements: int, seed_value: int, years: int) -> dict:
+    from passlib.context import CryptContext
+
+    if os.path.exists(path):
+        os.remove(path)
+    for suffix in ("-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    _create_schema(path)
+
+    rng = random.Random(seed_value)
+    hashed = CryptContext(schemes=["bcrypt"], deprecated="auto").hash(PASSWORD)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    started = time.perf_counter()
+
+    conn.executemany(
+        "INSERT INTO user (id, username, hashed_password, is_active, first_name, last_name, role) VALUES (?, ?, ?, 1, ?, ?, ?)",
+        ((i, f"user{i}", hashed, f"First{i}", f"Last{i}", "admin" if i <= max(1, users // 10) else "user")
+         for i in range(1, users + 1)),
+    )
+
+    codes = [f"{chr(65 + (i // 100) % 26)}{i % 100}" + (f"-{i // 2600}" if i >= 2600 else "") for i in range(locations)]
+    conn.executemany("INSERT INTO location (code, description) VALUES (?, ?)",
+                     ((code, f"Rack {code}") for code in codes))
+
+    wine_rows = []
+    used_keys = set()
+    for wine_id in range(1, wines + 1):
+        while True:
+            name = f"{rng.choice(WORDS)} {rng.choice(WORDS)} {wine_id}"
+            key = (name, rng.randint(1990, datetime.now().year), rng.choice(GRAPES))
+            if key not in used_keys:
+                used_keys.add(key)
+                break
+        wine_rows.append([wine_id, key[0], key[2], key[1], round(rng.uniform(8, 250), 2), 0,
+                          1 if rng.random() > 0.05 else 0, rng.randint(1, users), rng.choice(codes)])
+
+    per_wine, extra = divmod(movements, wines) if wines else (0, 0)
+    start = datetime.now() - timedelta(days=365 * years)
+    span = (datetime.now() - start).total_seconds()
+    movement_id = 0
+
+    def movement_rows():
+        nonlocal movement_id
+        for index, row in enumerate(wine_rows):
+            count = per_wine + (1 if index < extra else 0)
+            if count == 0:
+                continue
+            wine_id, available, user_id, location_code = row[0], row[6], row[7], row[8]
+            offsets = sorted(rng.random() * span for _ in range(count))
+            stock = 0
+            for n, offset in enumerate(offsets):
+                if n == 0:
+                    delta = rng.randint(12, 120)
+                elif n == count - 1 and not available:
+                    delta = -stock
+                else:
+                    delta = rng.randint(-6, 8)
+                    if stock + delta < 0:
+                        delta = -stock
+                    if delta == 0:
+                        delta = 1
+                stock += delta
+                movement_id += 1
+                yield (movement_id, delta, (start + timedelta(seconds=offset)).isoformat(sep=" "),
+                       None, wine_id, user_id, location_code)
+            row[5] = stock
+
+    batch = []
+    for movement in movement_rows():
+        batch.append(movement)
+        if len(batch) >= 50000:
+            conn.executemany("INSERT INTO stock_movement (id, delta, timestamp, comment, wine_id, user_id, location_code) "
+                             "VALUES (?, ?, ?, ?, ?, ?, ?)", batch)
+            batch.clear()
+    if batch:
+        conn.executemany("INSERT INTO stock_movement (id, delta, timestamp, comment, wine_id, user_id, location_code) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?)", batch)
+
+    conn.executemany(
+        "INSERT INTO wine (id, name, grape, year, price_usd, stock, is_available, user_id, location_code) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        wine_rows,
+    )
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.commit()
+    conn.close()
+    return {
+        "db": path,
+        "users": users,
+        "locations": locations,
+        "wines": wines,
+        "movements": movement_id,
+        "seed": seed_value,
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="bench.db")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--locations", type=int, default=200)
+    parser.add_argument("--wines", type=int, default=20000)
+    parser.add_argument("--movements", type=int, default=1000000)
+    parser.add_argument("--years", type=int, default=5, help="time span covered by the movements")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+    summary = seed(os.path.abspath(args.db), args.users, args.locations, args.wines, args.movements, args.seed, args.years)
+    print(summary, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
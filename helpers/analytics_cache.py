@@ -0,0 +1,75 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class InventoryAnalyticsCache:
+    """Inventory analytics per owner, computed once and reused until that owner's wines change.
+
+    WineServices invalidates only the owners touched by a wine or stock
+    mutation; every other owner keeps its entry. Each invalidation bumps the
+    owner's generation, so a result computed while a mutation committed is
+    not stored. The TTL bounds staleness when several workers serve the API.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._generations: dict[int, int] = {}
+        self._entries: "OrderedDict[int, tuple[int, Any, float]]" = OrderedDict()
+
+    def generation(self, user_id: int) -> int:
+        return self._generations.get(user_id, 0)
+
+    def get(self, user_id: int) -> Optional[Any]:
+        entry = self._entries.get(user_id)
+        if entry is None or entry[0] != self.generation(user_id) or entry[2] < time.monotonic():
+            self._entries.pop(user_id, None)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return entry[1]
+
+    def store(self, user_id: int, generation: int, value: Any) -> Any:
+        if generation == self.generation(user_id):
+            self._entries[user_id] = (generation, value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, user_id: int) -> None:
+        self._generations[user_id] = self.generation(user_id) + 1
+        self._entries.pop(user_id, None)
+        self.invalidations += 1
+
+    def clear(self) -> None:
+        for user_id in list(self._entries):
+            self.invalidate(user_id)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+inventory_analytics_cache = InventoryAnalyticsCache(
+    maxsize=int(os.getenv("ANALYTICS_CACHE_MAX_SIZE", "256")),
+    ttl=float(os.getenv("ANALYTICS_CACHE_TTL_SECONDS", "300")),
+)
@@ -8,6 +8,7 @@ from dotenv import load_dotenv
 from app.persistence.repository.user_repository import UserRepository
 from app.persistence.configuration.database import get_db
 from app.application.dtos.user.user_credentials import UserSession
+from helpers.user_cache import active_user_cache
 
 # Carga las variables de entorno
 load_dotenv()
@@ -41,12 +42,18 @@ async def current_user(
     except JWTError:
         raise credentials_exception
 
-    
-    # Busca el usuario en la base de datos
+    # Cache de usuarios activos: evita la consulta en cada request autenticado
+    if active_user_cache.get(user_id) == username:
+        return UserSession(id=user_id, username=username, role=user_role)
+
+    # Busca el usuario en la base de datos; si se invalida mientras tanto, no se guarda
+    generation = active_user_cache.generation(user_id)
     repo = UserRepository(db)
     user = await repo.auth(username)
 
-    if user is None:
+    if user is None or user.id != user_id:
         raise credentials_exception
 
+    active_user_cache.set(user.id, user.username, generation)
+
     return UserSession(id=user_id, username=username, role=user_role)
\ No newline at end of file
@@ -0,0 +1,73 @@
+import hashlib
+import os
+import time
+from typing import Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class CatalogEntry:
+    def __init__(self, version: int, body: bytes, expires_at: float):
+        self.version = version
+        self.body = body
+        self.expires_at = expires_at
+        self.etag = '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+
+
+class PublicCatalogCache:
+    """Serialized response of GET /wines/public, keyed on a catalog version counter.
+
+    WineServices bumps the version after every committed wine or stock change.
+    The counter is process-local, so the TTL bounds staleness when several
+    workers serve the API. The ETag is a hash of the body, not of the version,
+    so it stays valid across workers and restarts.
+    """
+
+    def __init__(self, ttl: float = 30.0):
+        self.ttl = ttl
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self._entry: Optional[CatalogEntry] = None
+
+    def bump(self) -> None:
+        self.version += 1
+        self._entry = None
+
+    def get(self) -> Optional[CatalogEntry]:
+        entry = self._entry
+        if entry is None or entry.version != self.version or entry.expires_at < time.monotonic():
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def store(self, version: int, body: bytes) -> CatalogEntry:
+        entry = CatalogEntry(version, body, time.monotonic() + self.ttl)
+        # a bump that happened while the body was being built leaves it uncached
+        if version == self.version:
+            self._entry = entry
+        return entry
+
+    @staticmethod
+    def matches(if_none_match: Optional[str], etag: str) -> bool:
+        if not if_none_match:
+            return False
+        candidates = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+    def stats(self) -> dict:
+        return {
+            "version": self.version,
+            "ttl_seconds": self.ttl,
+            "cached": self._entry is not None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+        }
+
+
+public_catalog_cache = PublicCatalogCache(ttl=float(os.getenv("CATALOG_CACHE_TTL_SECONDS", "30")))
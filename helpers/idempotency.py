@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+
+class StoredResponse:
+    def __init__(self, fingerprint: str, status_code: int, body: str, expires_at: float):
+        self.fingerprint = fingerprint
+        self.status_code = status_code
+        self.body = body
+        self.expires_at = expires_at
+
+
+class IdempotencyCache:
+    """Committed Idempotency-Key responses (bounded LRU) and the keys in flight in this process.
+
+    The idempotency_key table is the source of truth; this cache saves the
+    lookup on a replay. A request that finds its key in flight waits for the
+    owner to commit or roll back instead of running the same write twice;
+    the owner releases the key from the unit of work's commit and rollback
+    hooks. Expired rows are pruned every `prune_interval` seconds.
+    """
+
+    def __init__(self, ttl: float = 86400.0, maxsize: int = 1024, wait: float = 10.0, prune_interval: float = 3600.0):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.wait = wait
+        self.prune_interval = prune_interval
+        self.hits = 0
+        self.misses = 0
+        self.replays = 0
+        self.waits = 0
+        self.conflicts = 0
+        self.last_pruned = 0
+        self._entries: "OrderedDict[str, StoredResponse]" = OrderedDict()
+        self._in_flight: dict[str, asyncio.Future] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def get(self, key: str) -> Optional[StoredResponse]:
+        entry = self._entries.get(key)
+        if entry is None or entry.expires_at < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def store(self, key: str, fingerprint: str, status_code: int, body: str, ttl: Optional[float] = None) -> StoredResponse:
+        entry = StoredResponse(fingerprint, status_code, body, time.monotonic() + (self.ttl if ttl is None else ttl))
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return entry
+
+    def in_flight(self, key: str) -> Optional[asyncio.Future]:
+        return self._in_flight.get(key)
+
+    def begin(self, key: str) -> asyncio.Future:
+        # synchronous on purpose: nothing can interleave between the in_flight check and this
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        owner = asyncio.current_task()
+        if owner is not None:
+            # a cancelled request never reaches commit or rollback; don't leave its waiters hanging
+            owner.add_done_callback(lambda _: self.release(key, future))
+        return future
+
+    def release(self, key: str, future: asyncio.Future) -> None:
+        # only the owner's own future: a later owner of the same key keeps its entry
+        if self._in_flight.get(key) is not future:
+            return
+        del self._in_flight[key]
+        if not future.done():
+            future.set_result(None)
+
+    async def _prune_loop(self) -> None:
+        while True:
+            try:
+                self.last_pruned = await prune_expired()
+            except Exception:
+                logger.exception("Idempotency key pruning failed")
+            await asyncio.sleep(self.prune_interval)
+
+    def start(self) -> None:
+        if self.prune_interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._prune_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "in_flight": len(self._in_flight),
+            "hits": self.hits,
+            "misses": self.misses,
+            "replays": self.replays,
+            "waits": self.waits,
+            "conflicts": self.conflicts,
+            "last_pruned": self.last_pruned,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+async def prune_expired() -> int:
+    from app.persistence.configuration.database import async_session
+    from app.persistence.repository.idempotency_repository import IdempotencyRepository
+
+    async with async_session() as session:
+        pruned = await IdempotencyRepository(session).prune(datetime.now())
+        await session.commit()
+        return pruned
+
+
+idempotency_cache = IdempotencyCache(
+    ttl=float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400")),
+    maxsize=int(os.getenv("IDEMPOTENCY_CACHE_MAX_SIZE", "1024")),
+    wait=float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10")),
+    prune_interval=float(os.getenv("IDEMPOTENCY_PRUNE_INTERVAL_SECONDS", "3600")),
+)
@@ -0,0 +1,174 @@
+"""Checkpoints of the stock_movement ledger.
+
+A checkpoint run stores every (wine, location) balance at a day boundary, so
+inventory history reads one run plus the movements of the current day.
+Movements are stamped before their transaction commits, so the run for a
+boundary is only taken LEDGER_CHECKPOINT_GRACE_SECONDS after it: a movement
+stamped just before midnight and committed just after is still in the run.
+The API takes the latest settled run at startup and then every
+LEDGER_CHECKPOINT_INTERVAL_SECONDS; runs are idempotent across workers.
+
+Compaction moves movements older than a horizon to stock_movement_archive in
+batches of LEDGER_COMPACTION_BATCH_SIZE, one short transaction each, after
+taking the checkpoint at the horizon. Reads cover both tables, so balances
+and history do not change. The scheduler compacts once a day when
+LEDGER_COMPACTION_HORIZON_DAYS is set.
+
+    python -m helpers.ledger checkpoint [--at 2024-01-01T00:00:00]
+    python -m helpers.ledger compact [--horizon-days 365] [--batch-size 1000] [--pause 0.05]
+"""
+import argparse
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_INTERVAL_SECONDS = float(os.getenv("LEDGER_CHECKPOINT_INTERVAL_SECONDS", "3600"))
+# longer than any write transaction, from stamping a movement to its commit
+CHECKPOINT_GRACE_SECONDS = float(os.getenv("LEDGER_CHECKPOINT_GRACE_SECONDS", "300"))
+# 0 leaves compaction to the CLI
+COMPACTION_HORIZON_DAYS = int(os.getenv("LEDGER_COMPACTION_HORIZON_DAYS", "0"))
+COMPACTION_BATCH_SIZE = int(os.getenv("LEDGER_COMPACTION_BATCH_SIZE", "1000"))
+COMPACTION_PAUSE_SECONDS = float(os.getenv("LEDGER_COMPACTION_PAUSE_SECONDS", "0.05"))
+
+
+def local_time(value: Optional[datetime]) -> Optional[datetime]:
+    # movements are stamped with naive local times (datetime.now()); aware times are compared as such
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone().replace(tzinfo=None)
+
+
+def checkpoint_boundary(now: datetime) -> datetime:
+    return now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def settled_boundary(now: datetime, grace: float = CHECKPOINT_GRACE_SECONDS) -> datetime:
+    # the newest boundary every movement stamped before it has had time to commit
+    return checkpoint_boundary(now - timedelta(seconds=grace))
+
+
+async def take_checkpoint(taken_at: Optional[datetime] = None) -> int:
+    from app.application.services.stock_movement import StockMovementService
+    from app.persistence.configuration.database import async_session
+    from app.persistence.configuration.unit_of_work import UnitOfWork
+    from helpers.movement_writer import movement_writer
+
+    latest = datetime.now() - timedelta(seconds=CHECKPOINT_GRACE_SECONDS)
+    taken_at = taken_at or settled_boundary(datetime.now())
+    if taken_at > latest:
+        # a run is never rebuilt, so one taken too early would miss late commits for good
+        raise ValueError(f"Checkpoint at {taken_at} is within the {CHECKPOINT_GRACE_SECONDS:g}s grace period, latest allowed is {latest}")
+    # queued movements belong before the boundary they were recorded at
+    await movement_writer.flush()
+    async with async_session() as session:
+        return await StockMovementService(UnitOfWork(session)).take_checkpoint(taken_at)
+
+
+def compaction_cutoff(now: datetime, horizon_days: int) -> datetime:
+    return checkpoint_boundary(now) - timedelta(days=horizon_days)
+
+
+async def compact(cutoff: datetime, batch_size: int = COMPACTION_BATCH_SIZE, pause: float = COMPACTION_PAUSE_SECONDS) -> dict:
+    from app.application.services.stock_movement import StockMovementService
+    from app.persistence.configuration.database import async_session
+    from app.persistence.configuration.unit_of_work import UnitOfWork
+
+    async with async_session() as session:
+        return await StockMovementService(UnitOfWork(session)).compact(cutoff, batch_size=batch_size, pause=pause)
+
+
+class CheckpointScheduler:
+    def __init__(self, interval: float = CHECKPOINT_INTERVAL_SECONDS, horizon_days: int = COMPACTION_HORIZON_DAYS):
+        self.interval = interval
+        self.horizon_days = horizon_days
+        self.last_run: Optional[datetime] = None
+        self.last_rows = 0
+        self.last_compaction: Optional[datetime] = None
+        self.last_archived = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def _loop(self) -> None:
+        while True:
+            boundary = settled_boundary(datetime.now())
+            if self.last_run != boundary:
+                try:
+                    self.last_rows = await take_checkpoint(boundary)
+                    self.last_run = boundary
+                except Exception:
+                    logger.exception("Ledger checkpoint at %s failed", boundary)
+            if self.horizon_days > 0 and self.last_compaction != boundary:
+                try:
+                    self.last_archived = (await compact(compaction_cutoff(boundary, self.horizon_days)))["archived"]
+                    self.last_compaction = boundary
+                except Exception:
+                    logger.exception("Ledger compaction at %s failed", boundary)
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "interval_seconds": self.interval,
+            "grace_seconds": CHECKPOINT_GRACE_SECONDS,
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+            "last_rows": self.last_rows,
+            "compaction_horizon_days": self.horizon_days,
+            "last_compaction": self.last_compaction.isoformat() if self.last_compaction else None,
+            "last_archived": self.last_archived,
+        }
+
+
+checkpoint_scheduler = CheckpointScheduler()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    checkpoint = commands.add_parser("checkpoint", help="store the balances before --at (default: the latest settled midnight)")
+    checkpoint.add_argument("--at", type=lambda value: local_time(datetime.fromisoformat(value)))
+    compaction = commands.add_parser("compact", help="archive the movements older than the horizon")
+    compaction.add_argument("--horizon-days", type=int, default=COMPACTION_HORIZON_DAYS or 365)
+    compaction.add_argument("--batch-size", type=int, default=COMPACTION_BATCH_SIZE)
+    compaction.add_argument("--pause", type=float, default=COMPACTION_PAUSE_SECONDS, help="seconds between batches")
+    args = parser.parse_args(argv)
+
+    if args.command == "checkpoint":
+        from helpers.start_db import start_db
+
+        start_db()
+        try:
+            rows = asyncio.run(take_checkpoint(args.at))
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"Checkpoint stored {rows} balances" if rows else "Checkpoint already taken, nothing stored")
+    elif args.command == "compact":
+        from helpers.start_db import start_db
+
+        start_db()
+        cutoff = compaction_cutoff(datetime.now(), args.horizon_days)
+        result = asyncio.run(compact(cutoff, batch_size=args.batch_size, pause=args.pause))
+        print(f"Archived {result['archived']} movements before {result['cutoff']}, "
+              f"pruned {result['checkpoint_rows_pruned']} checkpoint rows")
+
+
+if __name__ == "__main__":
+    main()
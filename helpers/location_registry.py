@@ -0,0 +1,83 @@
+import os
+import time
+from typing import Iterable, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class LocationRegistry:
+    """Process-local map of location code -> description, loaded whole.
+
+    Locations are a small set that rarely changes, so the registry is warmed at
+    startup and LocationServices resolves codes from it in O(1). LocationServices
+    updates it once a location create, update or delete commits. A code the
+    registry does not know still goes to the database (another worker may have
+    created it), and the TTL bounds staleness of descriptions across workers.
+    """
+
+    def __init__(self, ttl: float = 300.0):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.invalidations = 0
+        self.expires_at = 0.0
+        self._entries: dict[str, str] = {}
+
+    @property
+    def loaded(self) -> bool:
+        return self.expires_at >= time.monotonic()
+
+    def load(self, locations: Iterable[tuple[str, str]]) -> None:
+        self._entries = dict(locations)
+        self.expires_at = time.monotonic() + self.ttl
+        self.loads += 1
+
+    def get(self, code: str) -> Optional[str]:
+        description = self._entries.get(code) if self.loaded else None
+        if description is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return description
+
+    def get_many(self, codes: Iterable[str]) -> tuple[dict[str, str], set[str]]:
+        """(found code -> description, codes left for the database)."""
+        found, missing = {}, set()
+        for code in codes:
+            description = self.get(code)
+            if description is None:
+                missing.add(code)
+            else:
+                found[code] = description
+        return found, missing
+
+    def put(self, code: str, description: str) -> None:
+        self._entries[code] = description
+
+    def put_missing(self, locations: dict[str, str]) -> None:
+        # mirrors INSERT ... ON CONFLICT DO NOTHING: known codes keep their description
+        for code, description in locations.items():
+            self._entries.setdefault(code, description)
+
+    def invalidate(self, code: str) -> None:
+        self._entries.pop(code, None)
+        self.invalidations += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "ttl_seconds": self.ttl,
+            "loaded": self.loaded,
+            "loads": self.loads,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+location_registry = LocationRegistry(ttl=float(os.getenv("LOCATION_REGISTRY_TTL_SECONDS", "300")))
@@ -0,0 +1,175 @@
+import logging
+import os
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100, 250)
+# a request issuing more statements than this is logged as a likely N+1
+QUERY_WARN_THRESHOLD = int(os.getenv("METRICS_QUERY_WARN_THRESHOLD", "20"))
+
+
+class Histogram:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+# set by MetricsMiddleware for the duration of a request, read by the SQL hooks
+current_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("current_request_stats", default=None)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.latency: dict[tuple, Histogram] = {}
+        self.queries: dict[tuple, Histogram] = {}
+        self.db_seconds: dict[tuple, float] = {}
+        self.responses: dict[tuple, int] = {}
+        self.queries_outside_requests = 0
+
+    def record(self, method: str, route: str, status: int, seconds: float, stats: RequestStats) -> None:
+        key = (method, route)
+        self.latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(seconds)
+        self.queries.setdefault(key, Histogram(QUERY_COUNT_BUCKETS)).observe(stats.queries)
+        self.db_seconds[key] = self.db_seconds.get(key, 0.0) + stats.db_seconds
+        self.responses[(method, route, status)] = self.responses.get((method, route, status), 0) + 1
+        if stats.queries > QUERY_WARN_THRESHOLD:
+            logger.warning("%s %s issued %d SQL statements (%.1f ms in the database), possible N+1",
+                           method, route, stats.queries, stats.db_seconds * 1000)
+
+    def render(self, extra_gauges: Optional[dict] = None) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+
+        def histogram(name: str, help_text: str, series: dict[tuple, Histogram]):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for (method, route), hist in sorted(series.items()):
+                labels = f'method="{method}",route="{_escape(route)}"'
+                cumulative = 0
+                for bound, count in zip(hist.buckets, hist.counts):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+                lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {hist.count}')
+                lines.append(f"{name}_sum{{{labels}}} {hist.sum}")
+                lines.append(f"{name}_count{{{labels}}} {hist.count}")
+
+        histogram("http_request_duration_seconds", "Request latency by route template.", self.latency)
+        histogram("db_queries_per_request", "SQL statements executed per request.", self.queries)
+
+        lines.append("# HELP db_query_duration_seconds_total Time spent in SQL statements, attributed to the route.")
+        lines.append("# TYPE db_query_duration_seconds_total counter")
+        for (method, route), seconds in sorted(self.db_seconds.items()):
+            lines.append(f'db_query_duration_seconds_total{{method="{method}",route="{_escape(route)}"}} {seconds}')
+
+        lines.append("# HELP http_responses_total Responses by route template and status code.")
+        lines.append("# TYPE http_responses_total counter")
+        for (method, route, status), count in sorted(self.responses.items()):
+            lines.append(f'http_responses_total{{method="{method}",route="{_escape(route)}",status="{status}"}} {count}')
+
+        lines.append("# HELP db_queries_outside_requests_total SQL statements not issued by an HTTP request.")
+        lines.append("# TYPE db_queries_outside_requests_total counter")
+        lines.append(f"db_queries_outside_requests_total {self.queries_outside_requests}")
+
+        for component, stats in (extra_gauges or {}).items():
+            for key, value in stats.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f"winery_{component}_{key} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"')
+
+
+metrics_registry = MetricsRegistry()
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware: per-route latency, status and SQL statements of each HTTP request."""
+
+    def __init__(self, app, registry: MetricsRegistry = metrics_registry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request_stats.set(stats)
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_request_stats.reset(token)
+            # FastAPI stores the matched APIRoute in the scope; using its template keeps label cardinality bounded
+            route = scope.get("route")
+            self.registry.record(scope["method"], getattr(route, "path", "unmatched"), status["code"], elapsed, stats)
+
+
+def install_sql_hooks(engine: AsyncEngine, registry: MetricsRegistry = metrics_registry) -> None:
+    """Attributes every SQL statement and its duration to the request running it, failed ones included."""
+
+    def _record(context) -> None:
+        # the start time lives on the statement's own execution context, so a statement that raises
+        # leaves nothing behind on the pooled connection
+        started = getattr(context, "metrics_started", None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        context.metrics_started = None
+        stats = current_request_stats.get()
+        if stats is None:
+            registry.queries_outside_requests += 1
+            return
+        stats.queries += 1
+        stats.db_seconds += elapsed
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context.metrics_started = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            _record(context)
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def _error(exception_context):
+        if exception_context.execution_context is not None:
+            _record(exception_context.execution_context)
@@ -0,0 +1,264 @@
+"""Versioned schema migrations for existing databases.
+
+`create_all` only creates missing tables, so anything added to an existing
+table (indexes, constraints) has to ship as a migration here. Migrations run
+in order, each in its own transaction, and are recorded in `schema_version`.
+
+    python -m helpers.migrations            # apply pending migrations
+    python -m helpers.migrations --check    # EXPLAIN QUERY PLAN of every repository query
+"""
+import asyncio
+import os
+import sys
+from datetime import datetime
+
+from dotenv import load_dotenv
+from sqlalchemy import event, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError
+
+load_dotenv()
+
+
+def add_column(table: str, column: str, definition: str):
+    # SQLite has no ADD COLUMN IF NOT EXISTS, and create_all already adds the column on a new database
+    def statement(connection: Connection) -> None:
+        columns = {row[1] for row in connection.execute(text(f"PRAGMA table_info({table})"))}
+        if column not in columns:
+            connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"))
+    return statement
+
+
+# (version, description, statements). Never edit an applied migration, add a new one.
+# A statement is SQL text, or a callable run with the connection.
+MIGRATIONS = [
+    (1, "indexes for hot wine and stock_movement queries", [
+        "CREATE INDEX IF NOT EXISTS ix_wine_user_id_is_available ON wine (user_id, is_available)",
+        "CREATE INDEX IF NOT EXISTS ix_wine_location_code ON wine (location_code)",
+        "CREATE INDEX IF NOT EXISTS ix_stock_movement_wine_id_timestamp ON stock_movement (wine_id, timestamp)",
+        "CREATE INDEX IF NOT EXISTS ix_stock_movement_location_code_timestamp ON stock_movement (location_code, timestamp)",
+    ]),
+    (2, "unique wine (name, year, grape) among available wines", [
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_wine_name_year_grape ON wine (name, year, grape) WHERE is_available = 1",
+    ]),
+    (3, "full-text search over wine name and grape", [
+        # external content table: the index lives in wine_fts, the text stays in wine
+        "CREATE VIRTUAL TABLE IF NOT EXISTS wine_fts USING fts5("
+        "name, grape, content='wine', content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+        "CREATE VIRTUAL TABLE IF NOT EXISTS wine_fts_vocab USING fts5vocab(wine_fts, 'row')",
+        "CREATE TRIGGER IF NOT EXISTS wine_fts_ai AFTER INSERT ON wine BEGIN "
+        "INSERT INTO wine_fts (rowid, name, grape) VALUES (new.id, new.name, new.grape); END",
+        "CREATE TRIGGER IF NOT EXISTS wine_fts_ad AFTER DELETE ON wine BEGIN "
+        "INSERT INTO wine_fts (wine_fts, rowid, name, grape) VALUES ('delete', old.id, old.name, old.grape); END",
+        "CREATE TRIGGER IF NOT EXISTS wine_fts_au AFTER UPDATE OF name, grape ON wine BEGIN "
+        "INSERT INTO wine_fts (wine_fts, rowid, name, grape) VALUES ('delete', old.id, old.name, old.grape); "
+        "INSERT INTO wine_fts (rowid, name, grape) VALUES (new.id, new.name, new.grape); END",
+        "INSERT INTO wine_fts (wine_fts) VALUES ('rebuild')",
+    ]),
+    (4, "indexes for filtered and sorted wine listings", [
+        "CREATE INDEX IF NOT EXISTS ix_wine_user_id_is_available_grape_year ON wine (user_id, is_available, grape, year)",
+        "CREATE INDEX IF NOT EXISTS ix_wine_user_id_is_available_price_usd ON wine (user_id, is_available, price_usd)",
+        "CREATE INDEX IF NOT EXISTS ix_wine_user_id_is_available_year ON wine (user_id, is_available, year)",
+        "CREATE INDEX IF NOT EXISTS ix_wine_user_id_is_available_stock ON wine (user_id, is_available, stock)",
+    ]),
+    (5, "time-ordered index for cellar-wide ledger ranges", [
+        "CREATE INDEX IF NOT EXISTS ix_stock_movement_timestamp ON stock_movement (timestamp)",
+    ]),
+    (6, "covering index for per-location occupancy", [
+        "CREATE INDEX IF NOT EXISTS ix_wine_location_code_is_available_stock ON wine (location_code, is_available, stock)",
+    ]),
+    (7, "row version on wine for optimistic concurrency", [
+        add_column("wine", "version", "INTEGER NOT NULL DEFAULT 1"),
+    ]),
+]
+
+
+def current_version(connection: Connection) -> int:
+    connection.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_version ("
+        "version INTEGER NOT NULL PRIMARY KEY, description VARCHAR NOT NULL, applied_at DATETIME NOT NULL)"
+    ))
+    version = connection.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_version")).scalar_one()
+    connection.commit()
+    return version
+
+
+def run_migrations(connection: Connection) -> list[int]:
+    """Applies pending migrations on a sync connection (or inside AsyncConnection.run_sync)."""
+    applied = []
+    version = current_version(connection)
+    for number, description, statements in MIGRATIONS:
+        if number <= version:
+            continue
+        try:
+            for statement in statements:
+                if callable(statement):
+                    statement(connection)
+                else:
+                    connection.execute(text(statement))
+            connection.execute(
+                text("INSERT INTO schema_version (version, description, applied_at) VALUES (:v, :d, :t)"),
+                {"v": number, "d": description, "t": datetime.now()},
+            )
+            connection.commit()
+        except IntegrityError as e:
+            connection.rollback()
+            raise RuntimeError(
+                f"Migration {number} ({description}) failed on existing data, fix the conflicting rows first: {e.orig}"
+            ) from e
+        print(f"Applied migration {number}: {description}")
+        applied.append(number)
+    return applied
+
+
+# Repository calls that read a whole table on purpose; a SCAN of these tables is expected.
+FULL_SCANS = {
+    "WineRepository.read()": {"wine"},
+    "WineRepository.stream()": {"wine"},
+    "LocationRepository.read()": {"location"},
+    "UserRepository.read()": {"user"},
+    "StockMovementRepository.read()": {"stock_movement"},
+}
+
+# Repository calls whose ORDER BY / GROUP BY cannot come from an index: relevance ranking,
+# the per-owner inventory aggregates, and ledger queries that group or re-order one
+# checkpoint run plus its tail (the scans themselves are index ranges).
+TEMP_SORTS = {
+    "WineRepository.search()",
+    "WineRepository.inventory_summary()",
+    "StockMovementRepository.history()",
+    "StockMovementRepository.balances_as_of()",
+    "StockMovementRepository.series()",
+    "StockMovementRepository.series(wine_id)",
+    "StockCheckpointRepository.create_run()",
+    "StockCheckpointRepository.prune_runs()",
+}
+
+
+async def _repository_calls(session):
+    # imported lazily: start_db imports this module at startup and only the check needs repositories
+    from app.persistence.repository.wine_repository import WineRepository
+    from app.persistence.repository.location_repository import LocationRepository
+    from app.persistence.repository.user_repository import UserRepository
+    from app.persistence.repository.stock_movement_repository import StockMovementRepository
+    from app.persistence.repository.stock_checkpoint_repository import StockCheckpointRepository
+    from app.persistence.repository.idempotency_repository import IdempotencyRepository
+
+    wines = WineRepository(session)
+    locations = LocationRepository(session)
+    users = UserRepository(session)
+    movements = StockMovementRepository(session)
+    checkpoints = StockCheckpointRepository(session)
+    idempotency = IdempotencyRepository(session)
+    day, now = datetime(2024, 1, 1), datetime.now()
+    return [
+        ("WineRepository.read_by_id()", lambda: wines.read_by_id(1)),
+        ("WineRepository.read_by_id_soft_delete()", lambda: wines.read_by_id_soft_delete(1)),
+        ("WineRepository.read()", lambda: wines.read()),
+        ("WineRepository.read(user_id)", lambda: wines.read(1)),
+        ("WineRepository.count_all(user_id)", lambda: wines.count_all(1)),
+        ("WineRepository.paginated(user_id)", lambda: wines.paginated(1, offset=0, limit=10)),
+        ("WineRepository.paginated(grape, year range, sort year)", lambda: wines.paginated(
+            1, offset=0, limit=10, filters={"grape": "Malbec", "year_min": 2015, "year_max": 2020, "sort_by": "year"})),
+        ("WineRepository.paginated(sort price desc)", lambda: wines.paginated(
+            1, offset=0, limit=10, filters={"sort_by": "price", "order": "desc"})),
+        ("WineRepository.paginated(stock_status low, sort stock)", lambda: wines.paginated(
+            1, offset=0, limit=10, filters={"stock_status": "low", "sort_by": "stock"})),
+        ("WineRepository.read(location_code)", lambda: wines.read(1, filters={"location_code": "A1"})),
+        ("WineRepository.count_all(price range)", lambda: wines.count_all(1, filters={"price_min": 10, "price_max": 40})),
+        ("WineRepository.keyset(user_id, after_id)", lambda: wines.keyset(1, after_id=1, limit=10)),
+        ("WineRepository.keyset(user_id, before_id)", lambda: wines.keyset(1, before_id=10, limit=10)),
+        ("WineRepository.stream()", lambda: _drain(wines.stream())),
+        ("WineRepository.adjust_stock()", lambda: wines.adjust_stock(1, 0)),
+        ("WineRepository.read_stock()", lambda: wines.read_stock(1)),
+        ("WineRepository.set_stock()", lambda: wines.set_stock(1, 0, 0)),
+        ("WineRepository.update(versions)", lambda: wines.update(1, {"price_usd": 10.0}, {1})),
+        ("WineRepository.reassign_location()", lambda: wines.reassign_location("A1", "A1")),
+        ("WineRepository.inventory_summary()", lambda: wines.inventory_summary(1)),
+        ("WineRepository.search()", lambda: wines.search('"malbec"*', limit=10)),
+        ("WineRepository.search_terms()", lambda: wines.search_terms()),
+        ("LocationRepository.read()", lambda: locations.read()),
+        ("LocationRepository.read_by_code()", lambda: locations.read_by_code("A1")),
+        ("LocationRepository.read_by_codes()", lambda: locations.read_by_codes({"A1", "B1"})),
+        ("LocationRepository.occupancy()", lambda: locations.occupancy()),
+        ("LocationRepository.occupancy(code)", lambda: locations.occupancy("A1")),
+        ("LocationRepository.has_wines()", lambda: locations.has_wines("A1")),
+        ("UserRepository.auth()", lambda: users.auth("test1")),
+        ("UserRepository.read()", lambda: users.read()),
+        ("UserRepository.read_by_id()", lambda: users.read_by_id(1)),
+        ("UserRepository.read_by_id_soft_deleted()", lambda: users.read_by_id_soft_deleted(1)),
+        ("UserRepository.get_by_username()", lambda: users.get_by_username("test1")),
+        ("StockMovementRepository.read()", lambda: movements.read()),
+        ("StockMovementRepository.read_by_id()", lambda: movements.read_by_id(1)),
+        ("StockMovementRepository.history()", lambda: movements.history(1, since=day, start=day, end=now, limit=500)),
+        ("StockMovementRepository.sum_deltas()", lambda: movements.sum_deltas(1, since=day, until=now)),
+        ("StockMovementRepository.balances_as_of()", lambda: movements.balances_as_of(day, now)),
+        ("StockMovementRepository.series()", lambda: movements.series(day, now, 86400, 7)),
+        ("StockMovementRepository.series(wine_id)", lambda: movements.series(day, now, None, 1, wine_id=1)),
+        ("StockMovementRepository.archive_before()", lambda: movements.archive_before(day, 100)),
+        ("StockCheckpointRepository.latest_run()", lambda: checkpoints.latest_run(now)),
+        ("StockCheckpointRepository.wine_balance()", lambda: checkpoints.wine_balance(1, now)),
+        ("StockCheckpointRepository.create_run()", lambda: checkpoints.create_run(now)),
+        ("StockCheckpointRepository.prune_runs()", lambda: checkpoints.prune_runs(day)),
+        ("IdempotencyRepository.read()", lambda: idempotency.read("POST /wines/ user 0:check", now)),
+        ("IdempotencyRepository.claim()", lambda: idempotency.claim("POST /wines/ user 0:check", "0", now, now)),
+        ("IdempotencyRepository.complete()", lambda: idempotency.complete("POST /wines/ user 0:check", 201, "{}")),
+        ("IdempotencyRepository.prune()", lambda: idempotency.prune(day)),
+    ]
+
+
+async def _drain(iterator):
+    async for _ in iterator:
+        pass
+
+
+async def check_query_plans(database_url: str) -> list[str]:
+    """Runs every repository query inside a rolled-back transaction, captures the SQL it
+    emits and returns the ones whose EXPLAIN QUERY PLAN scans a table without an index
+    or sorts in a temp b-tree."""
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+    engine = create_async_engine(database_url)
+    captured: list[tuple[str, object]] = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not statement.lstrip().upper().startswith("EXPLAIN"):
+            captured.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", capture)
+    problems = []
+    async with engine.connect() as conn:
+        transaction = await conn.begin()
+        session = AsyncSession(bind=conn)
+        tables = set((await conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'")).scalars())
+        for name, call in await _repository_calls(session):
+            captured.clear()
+            await call()
+            for statement, parameters in list(captured):
+                plan = (await conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)).all()
+                details = [row[-1] for row in plan]
+                allowed = FULL_SCANS.get(name, set())
+                bad = [
+                    detail for detail in details
+                    # SCAN of a subquery or CTE reads rows already produced by an index search, only table scans count
+                    if ("SCAN" in detail and "INDEX" not in detail and detail.split()[1] in tables
+                        and detail.split()[1] not in allowed)
+                    or ("TEMP B-TREE" in detail and name not in TEMP_SORTS)
+                ]
+                print(f"{'FAIL' if bad else 'ok  '} {name}: {' | '.join(details)}")
+                if bad:
+                    problems.append(f"{name}: {' | '.join(bad)}")
+        await session.close()
+        await transaction.rollback()
+    await engine.dispose()
+    return problems
+
+
+if __name__ == "__main__":
+    from helpers.start_db import start_db
+
+    # create_all for missing tables, then pending migrations
+    start_db()
+    if "--check" in sys.argv:
+        problems = asyncio.run(check_query_plans(os.getenv("DATABASE_URL")))
+        sys.exit(1 if problems else 0)
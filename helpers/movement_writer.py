@@ -0,0 +1,205 @@
+"""Write-behind logging of stock movements.
+
+With LEDGER_WRITE_MODE=batched, movements recorded by WineServices.create,
+delete and set_stock are queued in memory (at most LEDGER_WRITE_QUEUE_SIZE,
+callers wait when it is full) and inserted with one executemany and one
+commit per batch of LEDGER_WRITE_BATCH_SIZE rows, or every
+LEDGER_WRITE_FLUSH_INTERVAL_SECONDS. A batch that fails is kept and retried
+every LEDGER_WRITE_RETRY_SECONDS, ahead of anything queued after it.
+
+Rows are stamped when they are recorded, not when they are inserted. The
+queue is drained before this process takes a ledger checkpoint, but other
+workers' queues are not, so checkpoint runs only stay exact while
+LEDGER_CHECKPOINT_GRACE_SECONDS is longer than a row can wait here: the
+flush interval, plus however long a failing batch keeps being retried.
+Movements still queued when the process dies are lost, so the default
+mode, sync, keeps committing each movement inside the request.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+WRITE_MODE = os.getenv("LEDGER_WRITE_MODE", "sync")
+QUEUE_SIZE = int(os.getenv("LEDGER_WRITE_QUEUE_SIZE", "10000"))
+BATCH_SIZE = int(os.getenv("LEDGER_WRITE_BATCH_SIZE", "500"))
+FLUSH_INTERVAL_SECONDS = float(os.getenv("LEDGER_WRITE_FLUSH_INTERVAL_SECONDS", "0.5"))
+RETRY_SECONDS = float(os.getenv("LEDGER_WRITE_RETRY_SECONDS", "1"))
+
+
+class MovementWriter:
+    def __init__(self, mode: str = WRITE_MODE, maxsize: int = QUEUE_SIZE, batch_size: int = BATCH_SIZE,
+                 interval: float = FLUSH_INTERVAL_SECONDS, retry: float = RETRY_SECONDS):
+        self.mode = mode
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.interval = interval
+        self.retry = retry
+        self.enqueued = 0
+        self.flushed = 0
+        self.failed = 0
+        self.batches = 0
+        self.max_depth = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+        # set while rows wait in the queue; the flush task waits on it without dequeuing
+        self._pending = asyncio.Event()
+        # the batch whose insert failed, written again before anything else
+        self._unwritten: list = []
+
+    @property
+    def enabled(self) -> bool:
+        # only while the flush task runs: scripts and the sync mode write through the request session
+        return self._task is not None
+
+    async def submit(self, row: dict) -> None:
+        """Queues one stock_movement row; the caller sets its timestamp so ledger order is kept."""
+        await self._queue.put(row)
+        self._pending.set()
+        self.enqueued += 1
+        self.max_depth = max(self.max_depth, self._queue.qsize())
+
+    def _take(self, rows: list) -> None:
+        while len(rows) < self.batch_size and not self._queue.empty():
+            row = self._queue.get_nowait()
+            if row is None:
+                # the stop marker stays for the flush task
+                self._queue.put_nowait(row)
+                break
+            rows.append(row)
+
+    async def flush(self) -> int:
+        """Inserts everything queued so far, raising if a batch fails (its rows are kept).
+        Also called before checkpoints so a run sees every movement of this process."""
+        if self._queue is None:
+            return 0
+        written = 0
+        async with self._lock:
+            while True:
+                rows = self._unwritten
+                if not rows:
+                    rows = []
+                    self._take(rows)
+                if not rows:
+                    break
+                written += await self._write(rows)
+        return written
+
+    async def _write(self, rows: list) -> int:
+        # imported here: the application imports this module, not the other way round
+        from app.persistence.configuration.database import async_session
+        from app.persistence.repository.stock_movement_repository import StockMovementRepository
+
+        started = time.perf_counter()
+        self._unwritten = rows
+        try:
+            async with async_session() as session:
+                await StockMovementRepository(session).bulk_create(rows)
+                await session.commit()
+        except Exception:
+            self.failed += 1
+            logger.exception("Stock movement batch of %d rows failed, kept for retry", len(rows))
+            raise
+        self._unwritten = []
+        elapsed = (time.perf_counter() - started) * 1000
+        self.batches += 1
+        self.flushed += len(rows)
+        self.last_flush_ms = round(elapsed, 3)
+        self.max_flush_ms = max(self.max_flush_ms, self.last_flush_ms)
+        self.total_flush_ms += elapsed
+        return len(rows)
+
+    async def _collect(self) -> tuple[list, bool]:
+        # called holding the lock. A full batch goes out at once, a partial one after the interval;
+        # returns (rows, stop marker seen)
+        rows = []
+        deadline = time.monotonic() + self.interval
+        while len(rows) < self.batch_size:
+            if not self._queue.empty():
+                row = self._queue.get_nowait()
+            elif not rows:
+                # flush() emptied the queue while this task waited for the lock
+                break
+            else:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(self._queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            if row is None:
+                return rows, True
+            rows.append(row)
+        return rows, False
+
+    async def _loop(self) -> None:
+        stopping = False
+        while True:
+            await self._pending.wait()
+            failed = False
+            # rows are only dequeued holding the lock, so flush() also waits for the batch in hand
+            async with self._lock:
+                rows = self._unwritten
+                if not rows:
+                    rows, stopping = await self._collect()
+                if rows:
+                    try:
+                        await self._write(rows)
+                    except Exception:
+                        failed = True
+                if not self._unwritten and self._queue.empty():
+                    self._pending.clear()
+            if stopping and (failed or not self._unwritten):
+                # stop() flushes what is left and reports rows it cannot write
+                return
+            if failed:
+                await asyncio.sleep(self.retry)
+
+    def start(self) -> None:
+        if self.mode == "batched" and self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.maxsize)
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        # drains instead of cancelling, so no batch is cut in the middle of its commit
+        if self._task is not None:
+            await self._queue.put(None)
+            self._pending.set()
+            await self._task
+            self._task = None
+            try:
+                await self.flush()
+            except Exception as e:
+                lost = len(self._unwritten) + self._queue.qsize()
+                raise RuntimeError(f"{lost} stock movements could not be written to the ledger") from e
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "queue_max_depth": self.max_depth,
+            "queue_size": self.maxsize,
+            "enqueued": self.enqueued,
+            "flushed": self.flushed,
+            "failed_batches": self.failed,
+            "unwritten": len(self._unwritten),
+            "batches": self.batches,
+            "last_flush_ms": self.last_flush_ms,
+            "max_flush_ms": self.max_flush_ms,
+            "avg_flush_ms": round(self.total_flush_ms / self.batches, 3) if self.batches else 0.0,
+        }
+
+
+movement_writer = MovementWriter()
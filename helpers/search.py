@@ -0,0 +1,90 @@
+import os
+import re
+import time
+import unicodedata
+from typing import Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+_TOKEN = re.compile(r"\w+")
+
+
+def normalize(text: str) -> str:
+    # same folding as the FTS5 unicode61 tokenizer with remove_diacritics 2
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def _within_distance(a: str, b: str, limit: int) -> bool:
+    """Levenshtein distance(a, b) <= limit, giving up as soon as a row exceeds it."""
+    if abs(len(a) - len(b)) > limit:
+        return False
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return False
+        previous = current
+    return previous[-1] <= limit
+
+
+def _typo_budget(token: str) -> int:
+    if len(token) >= 8:
+        return 2
+    if len(token) >= 4:
+        return 1
+    return 0
+
+
+def build_match_query(q: str, vocabulary: list[str]) -> Optional[str]:
+    """FTS5 MATCH expression for free text: every word must match, either as a prefix
+    or as an indexed term within a small edit distance. None when q has no words."""
+    groups = []
+    for token in _TOKEN.findall(normalize(q)):
+        alternatives = [f'"{token}"*']
+        budget = _typo_budget(token)
+        if budget:
+            alternatives += [
+                f'"{term}"' for term in vocabulary
+                if term != token and not term.startswith(token) and _within_distance(token, term, budget)
+            ]
+        groups.append(alternatives[0] if len(alternatives) == 1 else "(" + " OR ".join(alternatives) + ")")
+    return " AND ".join(groups) or None
+
+
+class SearchVocabulary:
+    """Indexed terms of wine_fts, used to expand misspelled words.
+
+    Reloaded when the catalog version (bumped by WineServices on every wine
+    change) moves on, and at the latest after the TTL when several workers
+    serve the API.
+    """
+
+    def __init__(self, ttl: float = 300.0):
+        self.ttl = ttl
+        self.terms: list[str] = []
+        self.version: Optional[int] = None
+        self.expires_at = 0.0
+        self.loads = 0
+
+    def get(self, version: int) -> Optional[list[str]]:
+        if self.version != version or self.expires_at < time.monotonic():
+            return None
+        return self.terms
+
+    def store(self, version: int, terms: list[str]) -> list[str]:
+        self.terms = terms
+        self.version = version
+        self.expires_at = time.monotonic() + self.ttl
+        self.loads += 1
+        return terms
+
+    def stats(self) -> dict:
+        return {"terms": len(self.terms), "version": self.version, "loads": self.loads}
+
+
+search_vocabulary = SearchVocabulary(ttl=float(os.getenv("SEARCH_VOCABULARY_TTL_SECONDS", "300")))
@@ -1,20 +1,43 @@
 from sqlmodel import create_engine, SQLModel
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
 from app.domain.entities.user import User
 from app.domain.entities.wine import Wine
 from app.domain.entities.location import Location
 from app.domain.entities.stock_movement import StockMovement
+from app.domain.entities.stock_checkpoint import StockCheckpoint
+from app.domain.entities.stock_movement_archive import StockMovementArchive
+from app.domain.entities.idempotency_key import IdempotencyKey
 import os
+from helpers.migrations import run_migrations
 
 DATABASE_URL = os.getenv("DATABASE_URL").replace("+aiosqlite", "")
 
-def start_db():
-    sync_engine = create_engine(DATABASE_URL)
+def create_schema(connection: Connection) -> None:
     SQLModel.metadata.create_all(
-    bind=sync_engine,
+    bind=connection,
     tables=[
         User.__table__,
         Wine.__table__,
         Location.__table__,
         StockMovement.__table__,
+        StockCheckpoint.__table__,
+        StockMovementArchive.__table__,
+        IdempotencyKey.__table__,
     ],
 )
+    connection.commit()
+    run_migrations(connection)
+
+
+def start_db():
+    sync_engine = create_engine(DATABASE_URL)
+    with sync_engine.connect() as connection:
+        create_schema(connection)
+    sync_engine.dispose()
+
+
+async def start_db_async(engine: AsyncEngine) -> None:
+    # same as start_db, on the application's async engine instead of a second sync one
+    async with engine.connect() as connection:
+        await connection.run_sync(create_schema)
@@ -0,0 +1,111 @@
+import asyncio
+import os
+import time
+from typing import Optional
+
+from fastapi import FastAPI
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from app.persistence.repository.location_repository import LocationRepository
+from helpers.location_registry import location_registry
+from helpers.start_db import start_db_async
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+# Filled in by run_startup, served at /api/dashboard/startup
+startup_timings: dict = {}
+
+
+def _lock_path(database_url: str) -> Optional[str]:
+    if not database_url.startswith("sqlite") or ":memory:" in database_url:
+        return None
+    db_path = database_url.split(":///", 1)[1]
+    return os.getenv("DB_INIT_LOCK", db_path + ".init.lock")
+
+
+class FileLock:
+    """Exclusive lock shared by every worker of a deployment; a no-op without a path."""
+
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._handle = None
+
+    def acquire(self) -> None:
+        if self.path is None:
+            return
+        self._handle = open(self.path, "a+")
+        if fcntl:
+            fcntl.flock(self._handle, fcntl.LOCK_EX)
+            return
+        self._handle.seek(0)
+        while True:
+            try:
+                msvcrt.locking(self._handle.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                time.sleep(0.05)
+
+    def release(self) -> None:
+        if self._handle is None:
+            return
+        if fcntl:
+            fcntl.flock(self._handle, fcntl.LOCK_UN)
+        else:
+            self._handle.seek(0)
+            msvcrt.locking(self._handle.fileno(), msvcrt.LK_UNLCK, 1)
+        self._handle.close()
+        self._handle = None
+
+
+async def _prewarm_pool(engine: AsyncEngine, size: int) -> None:
+    async def touch():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    # concurrent checkouts so the pool really opens `size` connections
+    await asyncio.gather(*(touch() for _ in range(size)))
+
+
+async def _warm_location_registry(engine: AsyncEngine) -> int:
+    async with AsyncSession(engine) as session:
+        locations = await LocationRepository(session).read()
+    location_registry.load((location.code, location.description) for location in locations)
+    return len(locations)
+
+
+async def run_startup(app: FastAPI, engine: AsyncEngine, database_url: str, pool_size: int) -> dict:
+    started = time.perf_counter()
+
+    step = time.perf_counter()
+    lock = FileLock(_lock_path(database_url))
+    # the first worker applies schema changes, the others wait and find nothing pending
+    await asyncio.to_thread(lock.acquire)
+    try:
+        await start_db_async(engine)
+    finally:
+        lock.release()
+    startup_timings["schema_ms"] = round((time.perf_counter() - step) * 1000, 2)
+
+    step = time.perf_counter()
+    await _prewarm_pool(engine, pool_size)
+    startup_timings["pool_prewarm_ms"] = round((time.perf_counter() - step) * 1000, 2)
+    startup_timings["pool_connections"] = pool_size
+
+    step = time.perf_counter()
+    startup_timings["locations_loaded"] = await _warm_location_registry(engine)
+    startup_timings["location_registry_ms"] = round((time.perf_counter() - step) * 1000, 2)
+
+    step = time.perf_counter()
+    # builds the JSON schema of every route DTO once, instead of on the first /docs hit
+    app.openapi()
+    startup_timings["schema_precompile_ms"] = round((time.perf_counter() - step) * 1000, 2)
+
+    startup_timings["total_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    startup_timings["pid"] = os.getpid()
+    return startup_timings
@@ -0,0 +1,77 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class ActiveUserCache:
+    """Bounded TTL cache of active accounts, keyed by user id.
+
+    Only active users are stored, so a hit means the account existed and was
+    active less than `ttl` seconds ago. UserService invalidates entries when a
+    user is updated, deactivated or deleted; each invalidation bumps the user's
+    generation, so a lookup that raced with the change is not stored.
+    Invalidation only reaches this process: with several workers, the others
+    keep accepting the account for up to `ttl` seconds.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._generations: dict[int, int] = {}
+        self._entries: "OrderedDict[int, tuple[str, float]]" = OrderedDict()
+
+    def generation(self, user_id: int) -> int:
+        return self._generations.get(user_id, 0)
+
+    def get(self, user_id: int) -> Optional[str]:
+        entry = self._entries.get(user_id)
+        if entry is None or entry[1] < time.monotonic():
+            if entry is not None:
+                del self._entries[user_id]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return entry[0]
+
+    def set(self, user_id: int, username: str, generation: int) -> None:
+        if generation != self.generation(user_id):
+            return
+        self._entries[user_id] = (username, time.monotonic() + self.ttl)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        self._generations[user_id] = self.generation(user_id) + 1
+        self._entries.pop(user_id, None)
+        self.invalidations += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+active_user_cache = ActiveUserCache(
+    maxsize=int(os.getenv("USER_CACHE_MAX_SIZE", "1024")),
+    ttl=float(os.getenv("USER_CACHE_TTL_SECONDS", "60")),
+)
@@ -0,0 +1,8 @@
+import os
+import tempfile
+
+# the engine is built when app.persistence.configuration.database is imported, so the
+# test database has to be configured before any test module imports the application
+_db_dir = tempfile.mkdtemp(prefix="winery-tests-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(_db_dir, 'test.db')}"
+os.environ.setdefault("DB_PROFILE", "test")
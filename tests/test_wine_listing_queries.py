@@ -0,0 +1,81 @@
+"""The wine listings must issue the same number of statements whatever the number of wines (no N+1)."""
+import asyncio
+
+import pytest
+from sqlalchemy import event
+
+from app.application.dtos.user.user_credentials import UserSession
+from app.application.services.wine_services import WineServices
+from app.domain.entities.location import Location
+from app.domain.entities.user import User
+from app.domain.entities.wine import Wine
+from app.persistence.configuration.database import async_session, engine
+from app.persistence.configuration.unit_of_work import UnitOfWork
+from helpers.start_db import start_db_async
+
+N = 20
+ADMIN = UserSession(id=1, username="admin", role="admin")
+
+
+async def _seed(start: int, count: int) -> None:
+    async with async_session() as session:
+        if start == 0:
+            session.add_all([
+                User(id=1, username="admin", hashed_password="-", first_name="Ada", last_name="Admin", role="admin"),
+                User(id=2, username="other", hashed_password="-", first_name="Otto", last_name="Other"),
+            ])
+            session.add_all([Location(code=f"L{i}", description=f"Rack {i}") for i in range(10)])
+        # every wine on its own location and half of them owned by someone else, so a per-wine
+        # lookup of either relation would show up as extra statements
+        session.add_all([
+            Wine(name=f"Wine {i}", grape="Malbec", year=2015, price_usd=20.0, stock=i % 7,
+                 user_id=1 if i % 2 == 0 else 2, location_code=f"L{i % 10}")
+            for i in range(start, start + count)
+        ])
+        await session.commit()
+
+
+async def _count_statements(call) -> tuple[int, int]:
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    async with async_session() as session:
+        service = WineServices(UnitOfWork(session))
+        event.listen(engine.sync_engine, "before_cursor_execute", count)
+        try:
+            result = await call(service)
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", count)
+    items = result.items if hasattr(result, "items") else result
+    return len(statements), len(items)
+
+
+LISTINGS = {
+    "list_wines": lambda service: service.list_wines(ADMIN),
+    "list_public_wines": lambda service: service.list_public_wines(),
+    "list_paginated_wines": lambda service: service.list_paginated_wines(ADMIN, offset=0, limit=100),
+}
+
+
+@pytest.fixture(scope="module")
+def counts():
+    async def measure():
+        await start_db_async(engine)
+        await _seed(0, N)
+        small = {name: await _count_statements(call) for name, call in LISTINGS.items()}
+        await _seed(N, N)
+        large = {name: await _count_statements(call) for name, call in LISTINGS.items()}
+        await engine.dispose()
+        return small, large
+
+    return asyncio.run(measure())
+
+
+@pytest.mark.parametrize("listing", sorted(LISTINGS))
+def test_statement_count_does_not_grow_with_wines(counts, listing):
+    small, large = counts
+    (small_statements, small_items), (large_statements, large_items) = small[listing], large[listing]
+    assert large_items == 2 * small_items > 0
+    assert large_statements == small_statements